@@ -1,6 +1,8 @@
-from typing import Protocol, Tuple
+from typing import List, Optional, Protocol, Tuple
 import logging
 from app.config import settings
+from app.metrics import TOKENS_PROCESSED, BATCH_PADDING_EFFICIENCY, MODEL_MEMORY_BYTES
+from app.snapshot import model_source
 
 logger = logging.getLogger(__name__)
 
@@ -9,19 +11,27 @@ class BaseModelAdapter(Protocol):
         """Returns (score, label). Score 0-1."""
         ...
 
+    def score_batch(self, texts: List[str]) -> List[Tuple[float, str]]:
+        """Returns one (score, label) per input text, in order."""
+        ...
+
 class HuggingFacePipelineAdapter:
     def __init__(self, model_name: str, device: int = -1):
+        source, load_kwargs = model_source(model_name)
         from transformers import pipeline
         logger.info(f"Loading Hugging Face model: {model_name} on device {device}")
         # top_k=None returns all scores. function_to_apply="sigmoid" is crucial for multi-label models 
         # like TurkuNLP/bert-large-finnish-cased-toxicity to get independent probabilities.
         self._pipe = pipeline(
             "text-classification", 
-            model=model_name, 
+            model=source, 
             device=device, 
             top_k=None,
-            function_to_apply="sigmoid" 
+            function_to_apply="sigmoid",
+            model_kwargs=load_kwargs
         )
+        self._model_name = model_name
+        MODEL_MEMORY_BYTES.labels(model=model_name).set(_model_memory_bytes(self._pipe.model))
         logger.info("Model loaded successfully.")
 
     def score(self, text: str) -> Tuple[float, str]:
@@ -39,47 +49,198 @@ class HuggingFacePipelineAdapter:
         except Exception as e:
             logger.error(f"Model inference failed: {e}")
             return 0.0, "error"
+        self._record_tokens([text])
         
         # Handle potential batch output format (list of lists)
         if isinstance(results, list) and len(results) > 0 and isinstance(results[0], list):
             results = results[0]
             
-        toxic_score = 0.0
-        max_score = 0.0
-        max_label = "neutral"
-        found_toxic = False
+        return _pick_score(results)
+
+    def score_batch(self, texts: List[str]) -> List[Tuple[float, str]]:
+        """Scores several texts in one pipeline call (padded batches of MODEL_BATCH_SIZE)."""
+        scored = [(i, text[:512]) for i, text in enumerate(texts) if text and text.strip()]
+        outputs: List[Tuple[float, str]] = [(0.0, "neutral")] * len(texts)
+        if not scored:
+            return outputs
+
+        try:
+            results = self._pipe([text for _, text in scored], batch_size=settings.MODEL_BATCH_SIZE)
+        except Exception as e:
+            logger.error(f"Model batch inference failed: {e}")
+            return [(0.0, "error")] * len(texts)
+        self._record_tokens([text for _, text in scored])
+
+        for (i, _), res in zip(scored, results):
+            outputs[i] = _pick_score(res)
+        return outputs
+
+    def _record_tokens(self, texts: List[str]):
+        # The pipeline hides its encoded batch, so re-tokenize (fast tokenizer, cheap
+        # next to the forward pass) and mirror its batching to get padding efficiency
+        try:
+            encoded = self._pipe.tokenizer(texts, truncation=True)["input_ids"]
+        except Exception:
+            return
+        batch_size = max(1, settings.MODEL_BATCH_SIZE)
+        for start in range(0, len(encoded), batch_size):
+            _record_batch_tokens(self._model_name, [len(ids) for ids in encoded[start:start + batch_size]])
+
+
+def _record_batch_tokens(model_name: str, lengths: List[int]):
+    # Labelled by model so shadow-model traffic stays separate from the primary's
+    if not lengths:
+        return
+    TOKENS_PROCESSED.labels(model=model_name).inc(sum(lengths))
+    BATCH_PADDING_EFFICIENCY.labels(model=model_name).observe(sum(lengths) / (len(lengths) * max(lengths)))
+
+
+def _model_memory_bytes(model) -> int:
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def _pick_score(results: List[dict]) -> Tuple[float, str]:
+    """Picks the 'toxic' label score, falling back to the highest scoring label."""
+    toxic_score = 0.0
+    max_score = 0.0
+    max_label = "neutral"
+    found_toxic = False
+    
+    # Iterate through all labels to find 'toxic' or the highest scoring label
+    for res in results:
+        label = res.get("label", "")
+        score = float(res.get("score", 0.0))
         
-        # Iterate through all labels to find 'toxic' or the highest scoring label
-        for res in results:
-            label = res.get("label", "")
-            score = float(res.get("score", 0.0))
-            
-            # Track max score generic fallback
-            if score > max_score:
-                max_score = score
-                max_label = label
-            
-            # Specific check for toxicity
-            # TurkuNLP model uses 'toxic' as one of the labels
-            if label.lower() == "toxic":
-                toxic_score = score
-                found_toxic = True
-
-        if found_toxic:
-            return toxic_score, "toxic"
-            
-        # Fallback: if we didn't find "toxic" explicitly, return the highest scoring label
-        return max_score, max_label
+        # Track max score generic fallback
+        if score > max_score:
+            max_score = score
+            max_label = label
+        
+        # Specific check for toxicity
+        # TurkuNLP model uses 'toxic' as one of the labels
+        if label.lower() == "toxic":
+            toxic_score = score
+            found_toxic = True
+
+    if found_toxic:
+        return toxic_score, "toxic"
+        
+    # Fallback: if we didn't find "toxic" explicitly, return the highest scoring label
+    return max_score, max_label
+
+class TorchAdapter:
+    """
+    Optimized PyTorch CPU backend. Calls the tokenizer and model directly
+    (no pipeline pre/post-processing) under torch.inference_mode, with
+    optional fused SDPA attention, dynamic int8 quantization of Linear
+    layers and bf16 autocast. Scores match HuggingFacePipelineAdapter
+    (sigmoid over logits, same label selection) up to numeric precision.
+    """
+    def __init__(self, model_name: str, device: int = -1):
+        source, load_kwargs = model_source(model_name)
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        self._torch = torch
+        if settings.TORCH_NUM_THREADS > 0:
+            torch.set_num_threads(settings.TORCH_NUM_THREADS)
+        self._device = torch.device("cpu" if device < 0 else f"cuda:{device}")
+
+        logger.info(f"Loading torch model: {model_name} on {self._device} ({torch.get_num_threads()} threads)")
+        self._tokenizer = AutoTokenizer.from_pretrained(source, **load_kwargs)
+        model = None
+        if settings.TORCH_SDPA:
+            try:
+                model = AutoModelForSequenceClassification.from_pretrained(source, attn_implementation="sdpa", **load_kwargs)
+            except (ValueError, TypeError) as e:
+                logger.warning(f"SDPA attention unavailable for {model_name}, using default attention: {e}")
+        if model is None:
+            model = AutoModelForSequenceClassification.from_pretrained(source, **load_kwargs)
+        model.eval()
+
+        quantized = settings.TORCH_QUANTIZE_INT8 and device < 0
+        if quantized:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        # Quantized Linear kernels do not take bf16 inputs, so the two are exclusive
+        self._bf16 = settings.TORCH_BF16 and device < 0 and not quantized and _cpu_supports_bf16()
+
+        self._model = model.to(self._device)
+        self._model_name = model_name
+        MODEL_MEMORY_BYTES.labels(model=model_name).set(_model_memory_bytes(self._model))
+        self._labels = [model.config.id2label[i] for i in range(model.config.num_labels)]
+        self._max_length = min(self._tokenizer.model_max_length, 512)
+        logger.info(f"Model loaded successfully (int8={quantized}, bf16={self._bf16}).")
+
+    def score(self, text: str) -> Tuple[float, str]:
+        return self.score_batch([text])[0]
+
+    def score_batch(self, texts: List[str]) -> List[Tuple[float, str]]:
+        outputs: List[Tuple[float, str]] = [(0.0, "neutral")] * len(texts)
+        # Same character truncation as the pipeline adapter; sort by length so
+        # each padded batch holds similarly sized texts
+        scored = sorted(
+            ((i, text[:512]) for i, text in enumerate(texts) if text and text.strip()),
+            key=lambda item: len(item[1])
+        )
+        batch_size = max(1, settings.MODEL_BATCH_SIZE)
+        try:
+            for start in range(0, len(scored), batch_size):
+                chunk = scored[start:start + batch_size]
+                probs = self._forward([text for _, text in chunk])
+                for (i, _), row in zip(chunk, probs):
+                    outputs[i] = _pick_score(
+                        [{"label": label, "score": p} for label, p in zip(self._labels, row)]
+                    )
+        except Exception as e:
+            logger.error(f"Model inference failed: {e}")
+            return [(0.0, "error")] * len(texts)
+        return outputs
+
+    def _forward(self, texts: List[str]) -> List[List[float]]:
+        torch = self._torch
+        encoded = self._tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self._max_length,
+            return_tensors="pt",
+        ).to(self._device)
+        _record_batch_tokens(self._model_name, encoded["attention_mask"].sum(dim=1).tolist())
+        with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=self._bf16):
+            logits = self._model(**encoded).logits
+        return torch.sigmoid(logits.float()).tolist()
+
+
+def _cpu_supports_bf16() -> bool:
+    """bf16 only pays off with native instructions (AVX512-BF16 / AMX)."""
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
 
 class DummyAdapter:
     """For testing without heavy models"""
     def score(self, text: str) -> Tuple[float, str]:
         return 0.0, "dummy"
 
-def get_model_adapter() -> BaseModelAdapter:
-    if settings.MODEL_BACKEND == "huggingface_pipeline":
+    def score_batch(self, texts: List[str]) -> List[Tuple[float, str]]:
+        return [self.score(text) for text in texts]
+
+def get_model_adapter(backend: Optional[str] = None, model_name: Optional[str] = None) -> BaseModelAdapter:
+    """Builds an adapter. Defaults to the primary MODEL_BACKEND / MODEL_NAME."""
+    backend = backend or settings.MODEL_BACKEND
+    model_name = model_name or settings.MODEL_NAME
+    if backend == "huggingface_pipeline":
         return HuggingFacePipelineAdapter(
-            model_name=settings.MODEL_NAME,
+            model_name=model_name,
+            device=settings.MODEL_DEVICE
+        )
+    if backend == "torch":
+        return TorchAdapter(
+            model_name=model_name,
             device=settings.MODEL_DEVICE
         )
     return DummyAdapter()
@@ -0,0 +1,239 @@
+"""
+Offline bulk moderation.
+
+Streams JSONL or CSV records through ModerationEngine without HTTP or
+callbacks, for backfills and policy re-runs over stored content:
+
+    python -m app.bulk --input messages.jsonl --output verdicts.jsonl --workers 4
+
+Records are read lazily, scored in batches across worker processes and
+written in input order. Only a bounded window of batches is in flight, so
+memory stays flat regardless of input size. Progress is checkpointed next
+to the output file; re-running the same command resumes where it stopped.
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import multiprocessing.pool
+import os
+import sys
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+Record = Tuple[str, str]  # (id, text)
+
+
+# =============================================================================
+# Input
+# =============================================================================
+def read_records(stream: io.TextIOBase, fmt: str, id_field: str, text_field: str) -> Iterator[Record]:
+    """Yields (id, text) pairs. Records without an id are numbered by position."""
+    if fmt == "csv":
+        rows = csv.DictReader(stream)
+    else:
+        rows = (json.loads(line) for line in stream if line.strip())
+
+    for index, row in enumerate(rows):
+        record_id = row.get(id_field)
+        yield (str(record_id) if record_id not in (None, "") else str(index), row.get(text_field) or "")
+
+
+def iter_batches(records: Iterator[Record], batch_size: int) -> Iterator[List[Record]]:
+    batch: List[Record] = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# =============================================================================
+# Checkpointing
+# =============================================================================
+class Checkpoint:
+    """Records how many input records have been durably written to the output."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records_done = 0
+        self.output_bytes = 0
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        self.records_done = state["records_done"]
+        self.output_bytes = state["output_bytes"]
+        return True
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"records_done": self.records_done, "output_bytes": self.output_bytes}, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# =============================================================================
+# Scoring (runs in worker processes)
+# =============================================================================
+def _init_worker(torch_threads: int = 0):
+    # Without a cap every worker's torch would use all cores and they would oversubscribe the CPU
+    if torch_threads > 0 and settings.TORCH_NUM_THREADS <= 0:
+        settings.TORCH_NUM_THREADS = torch_threads
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+
+    from app.engine import engine
+    engine.initialize()
+
+
+def moderate_records(batch: List[Record]) -> List[Dict]:
+    from app.engine import engine
+    from app.models import ModerationInput
+
+    results = engine.moderate_batch([ModerationInput(id=i, text=t) for i, t in batch])
+    return [result.model_dump(mode="json") for result in results]
+
+
+# =============================================================================
+# Runner
+# =============================================================================
+def run(args: argparse.Namespace) -> int:
+    fmt = args.format or ("csv" if args.input.endswith(".csv") else "jsonl")
+    checkpoint = Checkpoint(args.checkpoint or f"{args.output}.checkpoint")
+    resumed = args.output != "-" and checkpoint.load()
+
+    if args.output == "-":
+        out = sys.stdout
+    elif resumed:
+        # Drop anything written after the last checkpoint, then append
+        out = open(args.output, "r+", encoding="utf-8")
+        out.truncate(checkpoint.output_bytes)
+        out.seek(checkpoint.output_bytes)
+        logger.warning(f"Resuming after {checkpoint.records_done} records")
+    else:
+        out = open(args.output, "w", encoding="utf-8")
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8", newline="")
+    records = read_records(source, fmt, args.id_field, args.text_field)
+    for _ in range(checkpoint.records_done):
+        next(records, None)
+    batches = iter_batches(records, args.batch_size)
+
+    pool: Optional[multiprocessing.pool.Pool] = None
+    if args.workers > 1:
+        torch_threads = max(1, (os.cpu_count() or 1) // args.workers)
+        pool = multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(torch_threads,))
+    else:
+        _init_worker()
+
+    started = time.perf_counter()
+    last_report = started
+    processed = 0
+    batches_since_checkpoint = 0
+    in_flight: deque = deque()
+    max_in_flight = max(1, args.workers) * 2
+
+    def write(batch_len: int, payloads: List[Dict]):
+        # The checkpoint is only saved here, after a whole batch, so records_done
+        # and output_bytes always describe the same position in the output
+        nonlocal processed, batches_since_checkpoint
+        for payload in payloads:
+            out.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        processed += batch_len
+        checkpoint.records_done += batch_len
+        batches_since_checkpoint += 1
+        if out is not sys.stdout and batches_since_checkpoint >= args.checkpoint_every:
+            out.flush()
+            os.fsync(out.fileno())
+            checkpoint.output_bytes = out.tell()
+            checkpoint.save()
+            batches_since_checkpoint = 0
+
+    try:
+        for batch in batches:
+            if pool is None:
+                write(len(batch), moderate_records(batch))
+            else:
+                in_flight.append((len(batch), pool.apply_async(moderate_records, (batch,))))
+                # Bounded window: wait for the oldest batch before reading more input
+                while len(in_flight) >= max_in_flight:
+                    batch_len, pending = in_flight.popleft()
+                    write(batch_len, pending.get())
+
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                _report(processed, now - started)
+                last_report = now
+
+        while in_flight:
+            batch_len, pending = in_flight.popleft()
+            write(batch_len, pending.get())
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if out is not sys.stdout:
+            out.close()
+        if source is not sys.stdin:
+            source.close()
+
+    if out is not sys.stdout:
+        checkpoint.remove()
+    _report(processed, time.perf_counter() - started, final=True)
+    return 0
+
+
+def _report(processed: int, elapsed: float, final: bool = False):
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    prefix = "Done" if final else "Progress"
+    print(f"{prefix}: {processed} records in {elapsed:.1f}s ({rate:.1f} records/s)", file=sys.stderr)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.bulk",
+        description="Moderate JSONL/CSV records offline, without HTTP or callbacks."
+    )
+    parser.add_argument("--input", "-i", default="-", help="Input file, or '-' for stdin (default)")
+    parser.add_argument("--output", "-o", required=True, help="Output JSONL file, or '-' for stdout")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Input format (default: from extension, else jsonl)")
+    parser.add_argument("--id-field", default="id", help="Record field holding the message id")
+    parser.add_argument("--text-field", default="text", help="Record field holding the message text")
+    parser.add_argument("--workers", "-w", type=int, default=1, help="Worker processes, each loading its own model")
+    parser.add_argument("--batch-size", "-b", type=int, default=settings.MODEL_BATCH_SIZE, help="Records per inference batch")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="Checkpoint every N batches")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between throughput reports")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(
+        level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        stream=sys.stderr,
+    )
+    return run(build_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Production traffic capture for replay load tests.
+
+With CAPTURE_ENABLED, a sample of POST /moderate requests is written as
+JSON lines with their arrival time to a size-rotated file. The request
+path only does a non-blocking put; hashing, redaction and file I/O happen
+on a background thread, and samples are dropped when its queue is full.
+
+CAPTURE_TEXT_MODE controls what is stored for the text:
+
+- raw:    the text as received.
+- redact: the text with e-mail addresses, URLs, @mentions and digits
+          masked. Length, language and wording are mostly preserved.
+- hash:   only the length and a keyed hash. Identical texts share a hash,
+          so duplicate rates survive; replay.py substitutes filler text.
+          The key is random per process, so the hash cannot be checked
+          against guessed texts.
+
+Replay a capture with replay.py.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from typing import Optional
+
+from app.config import settings
+from app.models import ModerationRequest
+from app.metrics import CAPTURE_RECORDS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+TEXT_MODES = ("raw", "redact", "hash")
+
+_REDACTIONS = [
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), "[email]"),
+    (re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE), "[url]"),
+    (re.compile(r"(?<!\w)@\w+"), "[user]"),
+    (re.compile(r"\d"), "0"),
+]
+
+
+def redact(text: str) -> str:
+    for pattern, replacement in _REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class TrafficCapture:
+    def __init__(self):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=settings.CAPTURE_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._hash_key = secrets.token_bytes(32)
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if not settings.CAPTURE_ENABLED:
+            return
+        if settings.CAPTURE_TEXT_MODE not in TEXT_MODES:
+            raise ValueError(f"CAPTURE_TEXT_MODE must be one of {', '.join(TEXT_MODES)}")
+        directory = os.path.dirname(settings.CAPTURE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        logger.info(
+            f"Capturing {settings.CAPTURE_SAMPLE_RATE:.0%} of requests "
+            f"({settings.CAPTURE_TEXT_MODE}) to {settings.CAPTURE_PATH}"
+        )
+        self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the writer after it has flushed the records already queued."""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout=5)
+
+    def record(self, request: ModerationRequest):
+        """Offers an incoming request to the capture. Never blocks."""
+        if self._thread is None or random.random() >= settings.CAPTURE_SAMPLE_RATE:
+            return
+        try:
+            self._queue.put_nowait((time.time(), request))
+        except queue.Full:
+            CAPTURE_RECORDS_TOTAL.labels(outcome="dropped").inc()
+
+    def _run(self):
+        handler = logging.handlers.RotatingFileHandler(
+            settings.CAPTURE_PATH,
+            maxBytes=settings.CAPTURE_MAX_BYTES,
+            backupCount=settings.CAPTURE_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                try:
+                    line = json.dumps(self._entry(*item), ensure_ascii=False)
+                    # The handler brings size-based rotation; the line is the whole record
+                    handler.emit(logging.makeLogRecord({"msg": line}))
+                    CAPTURE_RECORDS_TOTAL.labels(outcome="written").inc()
+                except Exception as e:
+                    logger.warning(f"Traffic capture failed: {e}")
+        finally:
+            handler.close()
+
+    def _entry(self, arrived_at: float, request: ModerationRequest) -> dict:
+        entry = {
+            "ts": round(arrived_at, 6),
+            "id": request.id,
+            "length": len(request.text),
+            "progressive": request.progressive,
+            "callback": request.callback_url is not None,
+        }
+        if request.previous_id is not None:
+            entry["previous_id"] = request.previous_id
+
+        mode = settings.CAPTURE_TEXT_MODE
+        if mode == "hash":
+            entry["text_hash"] = hmac.new(self._hash_key, request.text.encode("utf-8"), hashlib.sha256).hexdigest()
+        else:
+            entry["text"] = redact(request.text) if mode == "redact" else request.text
+        entry["text_mode"] = mode
+        return entry
+
+
+# Global instance
+traffic_capture = TrafficCapture()
@@ -25,13 +25,34 @@ class Settings(BaseSettings):
     # -------------------------------------------------------------------------
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "json"  # "json" or "text"
+    LOG_ASYNC: bool = True  # Write logs from a background thread via a bounded queue
+    LOG_QUEUE_SIZE: int = 10000  # Records beyond this are dropped, never waited on
+    # Per-event sampling for high-volume events ("event=rate,..."); unlisted events are always logged
+    LOG_SAMPLE_RATES: str = "request_queued=0.01,request_processing=0.01,callback_success=0.01"
     
     # -------------------------------------------------------------------------
     # Model Configuration
     # -------------------------------------------------------------------------
-    MODEL_BACKEND: str = "huggingface_pipeline"
+    MODEL_BACKEND: str = "huggingface_pipeline"  # "huggingface_pipeline", "torch" or "dummy"
     MODEL_NAME: str = "TurkuNLP/bert-large-finnish-cased-toxicity"
     MODEL_DEVICE: int = -1  # -1 for CPU, 0+ for GPU
+    MODEL_BATCH_SIZE: int = 16  # Padded batch size for batched inference
+    MODEL_SNAPSHOT_DIR: Optional[str] = None  # Load models offline from snapshots here (python -m app.snapshot)
+    
+    # Optimized torch backend (MODEL_BACKEND=torch)
+    TORCH_NUM_THREADS: int = 0  # 0 = torch default (all cores)
+    TORCH_SDPA: bool = True  # Fused scaled-dot-product attention
+    TORCH_QUANTIZE_INT8: bool = False  # Dynamic int8 quantization of Linear layers (CPU only)
+    TORCH_BF16: bool = False  # bf16 autocast, only on CPUs with AVX512-BF16/AMX
+    
+    # -------------------------------------------------------------------------
+    # Shadow Model Evaluation
+    # -------------------------------------------------------------------------
+    SHADOW_ENABLED: bool = False
+    SHADOW_MODEL_BACKEND: str = "huggingface_pipeline"
+    SHADOW_MODEL_NAME: Optional[str] = None
+    SHADOW_SAMPLE_RATE: float = 0.1  # Fraction of scored requests mirrored to the shadow model
+    SHADOW_QUEUE_SIZE: int = 100  # Samples are dropped (never waited on) when full
     
     # -------------------------------------------------------------------------
     # Wordlist Configuration
@@ -40,6 +61,11 @@ class Settings(BaseSettings):
     WORDLIST_FI_URL: str = "https://raw.githubusercontent.com/LDNOOBW/List-of-Dirty-Naughty-Obscene-and-Otherwise-Bad-Words/master/fi"
     WORDLIST_EN_URL: str = "https://raw.githubusercontent.com/LDNOOBW/List-of-Dirty-Naughty-Obscene-and-Otherwise-Bad-Words/master/en"
     WORDLIST_REFRESH_DAYS: int = 7
+    WORDLIST_COMPILED: bool = False  # mmap-loaded compiled store instead of a Python set; for lists of ~100k+ words
+    FUZZY_ENABLED: bool = False  # Also flag misspelled badwords within a small edit distance (never blocks alone)
+    FUZZY_DISTANCES: str = "5:1,9:2"  # min length:max edits; shorter words only match exactly
+    FUZZY_SAME_FIRST_LETTER: bool = True  # Near-misses must start with the badword's letter
+    FUZZY_ALLOWLIST_PATH: Optional[str] = None  # Defaults to the bundled app/fuzzy_allowlist.txt
     
     # -------------------------------------------------------------------------
     # Moderation Thresholds
@@ -47,6 +73,8 @@ class Settings(BaseSettings):
     TRIVIAL_LENGTH_THRESHOLD: int = 2
     BLOCK_THRESHOLD: float = 0.9
     FLAG_THRESHOLD: float = 0.7
+    # Progressive requests: treat a wordlist "block" as final and skip model scoring
+    PROGRESSIVE_SKIP_FINAL_ON_BLOCK: bool = False
     
     # -------------------------------------------------------------------------
     # Worker Configuration
@@ -54,7 +82,46 @@ class Settings(BaseSettings):
     MAX_RETRIES: int = 3
     RETRY_BACKOFF_FACTOR: float = 1.5
     CALLBACK_TIMEOUT: int = 10
+    CALLBACK_WORKERS: int = 4  # Threads delivering callbacks, separate from the moderation worker
+    CALLBACK_MAX_PER_HOST: int = 2  # Threads one callback host may occupy at once (keep below CALLBACK_WORKERS)
+    COALESCE_ENABLED: bool = True  # Share one score across identical in-flight texts
+    
+    # -------------------------------------------------------------------------
+    # Incremental Re-moderation (edits sent with previous_id)
+    # -------------------------------------------------------------------------
+    INCREMENTAL_ENABLED: bool = False  # Score long texts per sentence and reuse unchanged sentences
+    INCREMENTAL_MIN_LENGTH: int = 500  # Texts shorter than this (chars) are scored whole
+    INCREMENTAL_STORE_SIZE: int = 10000  # Message ids whose segment scores are kept
+
+    # -------------------------------------------------------------------------
+    # Callback Circuit Breakers (per callback_url host)
+    # -------------------------------------------------------------------------
+    CB_WINDOW: int = 20  # Recent deliveries considered for the failure rate
+    CB_MIN_CALLS: int = 5  # Minimum deliveries in the window before the breaker can open
+    CB_FAILURE_RATE: float = 0.5  # Failure rate that opens the breaker
+    CB_OPEN_SECONDS: float = 30.0  # Time before a probe is sent to an open host
+    CB_DEFERRED_MAX_PER_HOST: int = 1000  # Parked verdicts per open host (oldest dropped)
+    CB_IDLE_SECONDS: float = 600.0  # Forget a closed breaker (and its metric series) after this long without traffic
+
+    # -------------------------------------------------------------------------
+    # Result Store (GET /results/{id})
+    # -------------------------------------------------------------------------
+    RESULT_STORE_MAX_ITEMS: int = 10000
+    RESULT_TTL_SECONDS: int = 600
+    RESULT_STORE_DIR: Optional[str] = None  # Also persist results as JSON files here
+    RESULT_LONG_POLL_MAX_SECONDS: float = 30.0
 
+    # -------------------------------------------------------------------------
+    # Traffic Capture (replay load tests)
+    # -------------------------------------------------------------------------
+    CAPTURE_ENABLED: bool = False
+    CAPTURE_PATH: str = "./captures/moderate.jsonl"
+    CAPTURE_SAMPLE_RATE: float = 0.1  # Fraction of POST /moderate requests captured
+    CAPTURE_TEXT_MODE: str = "redact"  # "raw", "redact" or "hash"
+    CAPTURE_MAX_BYTES: int = 100 * 1024 * 1024  # Rotate the capture file at this size
+    CAPTURE_BACKUP_COUNT: int = 5  # Rotated capture files kept
+    CAPTURE_QUEUE_SIZE: int = 10000  # Records waiting to be written before sampling drops them
+    
     # -------------------------------------------------------------------------
     # Security
     # -------------------------------------------------------------------------
@@ -62,6 +129,21 @@ class Settings(BaseSettings):
     CORS_ORIGINS: str = "*"  # Comma-separated origins or "*"
     RATE_LIMIT_ENABLED: bool = True
     RATE_LIMIT_PER_MINUTE: int = 100
+    ADMIN_TOKEN: Optional[str] = None  # Required for /admin endpoints
+    
+    # -------------------------------------------------------------------------
+    # Tenant Policies (per API token)
+    # -------------------------------------------------------------------------
+    TENANT_POLICY_DIR: Optional[str] = None  # tokens.json + <tenant>.json profiles; unset = single policy
+    TENANT_CACHE_SIZE: int = 100  # Compiled tenant policies kept in memory (least recently used evicted)
+    TENANT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # Also evict once compiled tenant wordlists exceed this
+    
+    # -------------------------------------------------------------------------
+    # Profiling (POST /admin/profile)
+    # -------------------------------------------------------------------------
+    PROFILING_ENABLED: bool = False
+    PROFILE_MAX_SECONDS: float = 60.0
+    PROFILE_SAMPLE_INTERVAL: float = 0.005  # Stack sampling period in seconds
     
     # -------------------------------------------------------------------------
     # Server Settings
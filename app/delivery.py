@@ -0,0 +1,381 @@
+"""
+Callback delivery with per-host circuit breakers.
+
+Callbacks are sent from a small thread pool, so webhook latency and retry
+backoff never hold up the moderation worker. Verdicts wait in a queue per
+callback host, and at most CALLBACK_MAX_PER_HOST of a host's deliveries
+are in flight at once, so a slow or failing host cannot occupy every
+thread and starve the others. Each callback host also has its own breaker:
+
+- closed:    deliveries flow; outcomes are tracked over a sliding window.
+             When the failure rate over at least CB_MIN_CALLS calls reaches
+             CB_FAILURE_RATE, the breaker opens.
+- open:      nothing is sent to the host. New verdicts are parked in a
+             bounded per-host deferred queue. After CB_OPEN_SECONDS one
+             parked verdict is sent as a probe.
+- half-open: the probe is in flight. Success closes the breaker and
+             flushes the deferred queue; failure re-opens it.
+
+A broken integrator therefore costs one probe per CB_OPEN_SECONDS instead
+of MAX_RETRIES timeouts per verdict.
+
+Hosts are keyed by hostname:port, never by the raw netloc, so credentials
+in a callback URL do not end up in metric labels or logs. Callback URLs
+are chosen by clients, so closed breakers with no work left are evicted
+(with their metric series) after CB_IDLE_SECONDS without traffic.
+
+A "final" verdict supersedes the "preliminary" one for the same id and
+callback URL: queued or parked preliminaries are dropped, and if one is
+being sent, the final is held until that attempt settles. Consumers never
+receive a preliminary after its final.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from app.config import settings
+from app.log import log_event
+from app.models import CallbackPayload
+from app.metrics import (
+    CALLBACKS_TOTAL,
+    CALLBACK_RETRIES,
+    CALLBACK_LATENCY,
+    CALLBACK_BREAKER_STATE,
+    CALLBACK_DEFERRED,
+    CALLBACK_DEFERRED_DROPPED,
+    CALLBACK_THREAD_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# How often idle breakers are looked for (they are evicted after CB_IDLE_SECONDS)
+_IDLE_SWEEP_SECONDS = 60.0
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker. Not thread-safe; guarded by the dispatcher lock."""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.last_used = time.monotonic()
+        self._outcomes: Deque[bool] = deque(maxlen=settings.CB_WINDOW)
+        CALLBACK_BREAKER_STATE.labels(host=host).set(_STATE_VALUES[CLOSED])
+
+    def allow(self) -> bool:
+        """True if a delivery may be attempted now (closed breaker)."""
+        return self.state == CLOSED
+
+    def probe_due(self) -> bool:
+        return self.state == OPEN and time.monotonic() - self.opened_at >= settings.CB_OPEN_SECONDS
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"Callback host {self.host} recovered; closing breaker")
+            self._outcomes.clear()
+            self._set_state(CLOSED)
+        self._outcomes.append(True)
+
+    def record_failure(self):
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(False)
+        if self.state == CLOSED and len(self._outcomes) >= settings.CB_MIN_CALLS:
+            failure_rate = self._outcomes.count(False) / len(self._outcomes)
+            if failure_rate >= settings.CB_FAILURE_RATE:
+                logger.warning(f"Callback host {self.host} failing ({failure_rate:.0%}); opening breaker")
+                self._open()
+
+    def start_probe(self):
+        self._set_state(HALF_OPEN)
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self._set_state(OPEN)
+
+    def _set_state(self, state: str):
+        self.state = state
+        CALLBACK_BREAKER_STATE.labels(host=self.host).set(_STATE_VALUES[state])
+
+
+class CallbackDispatcher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._ready: Dict[str, Deque[Tuple[str, CallbackPayload]]] = {}
+        self._active: Dict[str, int] = {}
+        self._deferred: Dict[str, Deque[Tuple[str, CallbackPayload]]] = {}
+        # Preliminary verdicts not yet delivered or dropped, and finals waiting on them, by (url, id)
+        self._preliminary: Dict[Tuple[str, str], int] = {}
+        self._held: Dict[Tuple[str, str], CallbackPayload] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stop = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.CALLBACK_WORKERS,
+            thread_name_prefix="callback",
+        )
+        self._monitor = threading.Thread(target=self._probe_loop, name="callback-breaker", daemon=True)
+        self._monitor.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def submit(self, url: str, payload: CallbackPayload):
+        """Queues delivery on the host's own queue, or parks the verdict if its breaker is open."""
+        url = str(url)
+        host = host_key(url)
+        key = (url, payload.id)
+        with self._lock:
+            self._breaker(host).last_used = time.monotonic()
+            if payload.phase == "preliminary":
+                self._preliminary[key] = self._preliminary.get(key, 0) + 1
+            elif key in self._preliminary:
+                self._drop_queued_preliminary(host, key)
+                if key in self._preliminary:
+                    # A preliminary is being sent right now; the final goes out once it settles
+                    self._held[key] = payload
+                    return
+            self._enqueue(host, url, payload)
+
+    # -------------------------------------------------------------------------
+    # Internals
+    # -------------------------------------------------------------------------
+    def _breaker(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(host)
+        return breaker
+
+    def _enqueue(self, host: str, url: str, payload: CallbackPayload):
+        """Caller holds the lock."""
+        if not self._breaker(host).allow():
+            self._park(host, url, payload)
+            return
+        self._ready.setdefault(host, deque()).append((url, payload))
+        self._schedule(host)
+
+    def _superseded(self, url: str, payload: CallbackPayload) -> bool:
+        """True if payload is a preliminary whose final is waiting. Caller holds the lock."""
+        return payload.phase == "preliminary" and (url, payload.id) in self._held
+
+    def _settle(self, url: str, payload: CallbackPayload):
+        """Marks a preliminary as delivered or dropped and releases its held final. Caller holds the lock."""
+        if payload.phase != "preliminary":
+            return
+        key = (url, payload.id)
+        remaining = self._preliminary.get(key, 0) - 1
+        if remaining > 0:
+            self._preliminary[key] = remaining
+            return
+        self._preliminary.pop(key, None)
+        final = self._held.pop(key, None)
+        if final is not None:
+            self._enqueue(host_key(url), url, final)
+
+    def _drop_queued_preliminary(self, host: str, key: Tuple[str, str]):
+        """Removes not-yet-sent preliminaries for key from host's queues. Caller holds the lock."""
+        for queues in (self._ready, self._deferred):
+            queue = queues.get(host)
+            if not queue:
+                continue
+            kept = deque(item for item in queue if not (item[1].phase == "preliminary" and (item[0], item[1].id) == key))
+            dropped = len(queue) - len(kept)
+            if dropped:
+                queues[host] = kept
+                CALLBACKS_TOTAL.labels(status="superseded").inc(dropped)
+                remaining = self._preliminary[key] - dropped
+                if remaining > 0:
+                    self._preliminary[key] = remaining
+                else:
+                    del self._preliminary[key]
+        CALLBACK_DEFERRED.labels(host=host).set(len(self._deferred.get(host, ())))
+
+    def _schedule(self, host: str):
+        """Starts drain tasks for host up to CALLBACK_MAX_PER_HOST. Caller holds the lock."""
+        queue = self._ready.get(host)
+        active = self._active.get(host, 0)
+        while queue and active < min(len(queue), settings.CALLBACK_MAX_PER_HOST):
+            active += 1
+            self._executor.submit(self._drain, host)
+        self._active[host] = active
+
+    def _drain(self, host: str):
+        """Delivers one queued verdict for host, then requeues itself behind other hosts' work."""
+        with self._lock:
+            queue = self._ready.get(host)
+            item = queue.popleft() if queue else None
+        if item is not None:
+            self._deliver(host, *item)
+
+        with self._lock:
+            queue = self._ready.get(host)
+            if queue and not self._breaker(host).allow():
+                # Breaker opened while these were waiting: park them instead of sending
+                while queue:
+                    self._park(host, *queue.popleft())
+            if queue:
+                # Resubmitting (rather than looping) keeps the pool FIFO fair across hosts
+                self._executor.submit(self._drain, host)
+            else:
+                self._active[host] -= 1
+                self._ready.pop(host, None)
+
+    def _park(self, host: str, url: str, payload: CallbackPayload):
+        queue = self._deferred.setdefault(host, deque())
+        if len(queue) >= settings.CB_DEFERRED_MAX_PER_HOST:
+            dropped_url, dropped = queue.popleft()
+            logger.error(f"Deferred queue full for {host}; dropping callback for {dropped.id}")
+            CALLBACK_DEFERRED_DROPPED.inc()
+            CALLBACKS_TOTAL.labels(status="failed").inc()
+            self._settle(dropped_url, dropped)
+        queue.append((url, payload))
+        CALLBACK_DEFERRED.labels(host=host).set(len(queue))
+
+    def _deliver(self, host: str, url: str, payload: CallbackPayload, probe: bool = False):
+        payload_dict = payload.model_dump(mode="json")
+
+        attempts = 1 if probe else settings.MAX_RETRIES
+        for attempt in range(attempts):
+            with self._lock:
+                if self._superseded(url, payload):
+                    CALLBACKS_TOTAL.labels(status="superseded").inc()
+                    self._settle(url, payload)
+                    return
+                if not probe and not self._breaker(host).allow():
+                    # Opened since this was queued (or during backoff): don't pay another timeout
+                    self._park(host, url, payload)
+                    return
+
+            if self._send(url, payload, payload_dict, attempt, attempts):
+                with self._lock:
+                    self._breaker(host).record_success()
+                    self._settle(url, payload)
+                    flush = self._deferred.pop(host, deque())
+                    CALLBACK_DEFERRED.labels(host=host).set(0)
+                    if flush:
+                        self._ready.setdefault(host, deque()).extend(flush)
+                        self._schedule(host)
+                return
+
+            with self._lock:
+                self._breaker(host).record_failure()
+
+            if attempt < attempts - 1:
+                CALLBACK_RETRIES.inc()
+                # Backoff
+                backoff = settings.RETRY_BACKOFF_FACTOR ** attempt
+                time.sleep(backoff)
+                CALLBACK_THREAD_SECONDS.labels(state="backoff").inc(backoff)
+
+        with self._lock:
+            if not self._breaker(host).allow() and not self._superseded(url, payload):
+                # Host is down (or the probe failed): keep the verdict for the next probe
+                self._park(host, url, payload)
+                return
+            self._settle(url, payload)
+        logger.error(f"All callback attempts failed for {payload.id}")
+        CALLBACKS_TOTAL.labels(status="failed").inc()
+
+    def _send(self, url: str, payload: CallbackPayload, payload_dict: dict, attempt: int, attempts: int) -> bool:
+        callback_start = time.perf_counter()
+        try:
+            response = requests.post(url, json=payload_dict, timeout=settings.CALLBACK_TIMEOUT)
+        except Exception as e:
+            _observe_io(time.perf_counter() - callback_start)
+            logger.warning("Callback exception for %s: %s. Attempt %d/%d", payload.id, e, attempt + 1, attempts)
+            return False
+        _observe_io(time.perf_counter() - callback_start)
+
+        if 200 <= response.status_code < 300:
+            log_event(logger, "callback_success", id=payload.id, status=response.status_code)
+            CALLBACKS_TOTAL.labels(status="success").inc()
+            return True
+        logger.warning("Callback failed for %s (status %s). Attempt %d/%d", payload.id, response.status_code, attempt + 1, attempts)
+        return False
+
+    def _probe_loop(self):
+        """Sends one parked verdict to each host whose open period has elapsed."""
+        next_sweep = time.monotonic() + _IDLE_SWEEP_SECONDS
+        while not self._stop.wait(1.0):
+            if time.monotonic() >= next_sweep:
+                self._evict_idle()
+                next_sweep = time.monotonic() + _IDLE_SWEEP_SECONDS
+            probes = []
+            with self._lock:
+                # Only hosts with parked verdicts can need a probe
+                for host, queue in self._deferred.items():
+                    breaker = self._breaker(host)
+                    if breaker.probe_due() and queue:
+                        breaker.start_probe()
+                        url, payload = queue.popleft()
+                        CALLBACK_DEFERRED.labels(host=host).set(len(queue))
+                        probes.append((host, url, payload))
+            for host, url, payload in probes:
+                self._executor.submit(self._deliver, host, url, payload, True)
+
+    def _evict_idle(self):
+        """Forgets closed breakers with no queued work that saw no traffic for CB_IDLE_SECONDS."""
+        cutoff = time.monotonic() - settings.CB_IDLE_SECONDS
+        with self._lock:
+            idle = [
+                host for host, breaker in self._breakers.items()
+                if breaker.state == CLOSED and breaker.last_used < cutoff
+                and not self._ready.get(host) and not self._deferred.get(host) and not self._active.get(host)
+            ]
+            for host in idle:
+                del self._breakers[host]
+                self._ready.pop(host, None)
+                self._deferred.pop(host, None)
+                self._active.pop(host, None)
+                for gauge in (CALLBACK_BREAKER_STATE, CALLBACK_DEFERRED):
+                    try:
+                        gauge.remove(host)
+                    except KeyError:
+                        pass  # Series was never created
+        if idle:
+            logger.debug(f"Evicted {len(idle)} idle callback breakers")
+
+
+def host_key(url: str) -> str:
+    """hostname:port of url, without userinfo. Used as breaker key and metric label."""
+    parts = urlsplit(url)
+    hostname = parts.hostname or ""
+    if ":" in hostname:
+        hostname = f"[{hostname}]"  # IPv6
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    return f"{hostname}:{port or _DEFAULT_PORTS.get(parts.scheme, '')}"
+
+
+def _observe_io(duration: float):
+    CALLBACK_LATENCY.observe(duration)
+    CALLBACK_THREAD_SECONDS.labels(state="io").inc(duration)
+
+
+# Global instance
+callback_dispatcher = CallbackDispatcher()
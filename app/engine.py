@@ -1,14 +1,21 @@
 import logging
 import time
+from typing import List, Optional, Sequence, Tuple
 from app.config import settings
-from app.models import ModerationRequest, CallbackPayload, ModerationReason
+from app.models import ModerationInput, CallbackPayload, ModerationReason
 from app.wordlist import wordlist_loader
 from app.adapters import get_model_adapter, BaseModelAdapter
+from app.segments import SegmentStore, SegmentScores, segment_key, split_segments
+from app.tenants import TenantPolicy
+from app.wordlist_store import CompiledWordlist
 from app.metrics import (
     INFERENCE_TIME,
+    MODEL_LOAD_SECONDS,
+    SEGMENTS_TOTAL,
     WORDLIST_CHECK_TIME,
     WORDLISTS_LOADED,
     WORDLIST_ENTRIES,
+    WORKER_SECONDS,
 )
 
 logger = logging.getLogger(__name__)
@@ -16,6 +23,7 @@ logger = logging.getLogger(__name__)
 class ModerationEngine:
     def __init__(self):
         self.adapter: BaseModelAdapter = None
+        self.segment_store = SegmentStore(settings.INCREMENTAL_STORE_SIZE)
         
     def initialize(self):
         """Loads resources. This can be slow."""
@@ -26,61 +34,193 @@ class ModerationEngine:
         WORDLISTS_LOADED.set(2)  # fi and en
         WORDLIST_ENTRIES.set(len(wordlist_loader.badwords))
         
+        load_start = time.perf_counter()
         self.adapter = get_model_adapter()
+        MODEL_LOAD_SECONDS.set(time.perf_counter() - load_start)
         logger.info("ModerationEngine initialized.")
 
     def is_trivial(self, text: str) -> bool:
         stripped = text.strip()
         return len(stripped) < settings.TRIVIAL_LENGTH_THRESHOLD
 
-    def moderate(self, request: ModerationRequest) -> CallbackPayload:
+    def decide(
+        self,
+        is_badword: bool,
+        score: float,
+        policy: Optional[TenantPolicy] = None,
+        fuzzy: bool = False,
+    ) -> str:
+        """
+        Maps wordlist hit and model score to allow / flag / block, with the
+        tenant's thresholds if given. A fuzzy-only wordlist hit is at most a
+        flag; the model score decides whether it blocks.
+        """
+        block_threshold = policy.block_threshold if policy else settings.BLOCK_THRESHOLD
+        flag_threshold = policy.flag_threshold if policy else settings.FLAG_THRESHOLD
+        if is_badword:
+            return "block"
+        if score > block_threshold:
+            return "block"
+        if fuzzy or score > flag_threshold:
+            return "flag"
+        return "allow"
+
+    def precheck(self, request: ModerationInput, policy: Optional[TenantPolicy] = None) -> CallbackPayload:
+        """
+        Cheap first phase: trivial check and wordlist only, no model.
+        Trivial texts get their final verdict; everything else a preliminary one.
+        """
+        if self.is_trivial(request.text):
+            return self._trivial_result(request)
+
+        wordlist_start = time.perf_counter()
+        is_badword = wordlist_loader.contains_badword(request.text, _tenant_words(policy))
+        fuzzy = not is_badword and wordlist_loader.fuzzy_match(request.text)
+        WORDLIST_CHECK_TIME.observe(time.perf_counter() - wordlist_start)
+
+        return CallbackPayload(
+            id=request.id,
+            text=request.text,
+            decision=self.decide(is_badword, 0.0, policy, fuzzy),
+            reason=ModerationReason(
+                badword=is_badword,
+                toxicity_score=0.0,
+                model_label="wordlist",
+                fuzzy_badword=fuzzy,
+            ),
+            phase="preliminary"
+        )
+
+    def moderate(self, request: ModerationInput, policy: Optional[TenantPolicy] = None) -> CallbackPayload:
+        """Scores the text with the shared model, then applies the tenant's policy if given."""
         text = request.text
         
         # 1. Trivial check
         if self.is_trivial(text):
-            return CallbackPayload(
-                id=request.id,
-                text=text,
-                decision="allow",
-                reason=ModerationReason(
-                    badword=False,
-                    toxicity_score=0.0,
-                    model_label="trivial"
-                )
-            )
+            return self._trivial_result(request)
 
         # 2. Wordlist check with timing
-        wordlist_start = time.perf_counter()
-        is_badword = wordlist_loader.contains_badword(text)
-        wordlist_duration = time.perf_counter() - wordlist_start
-        WORDLIST_CHECK_TIME.observe(wordlist_duration)
+        is_badword, fuzzy = self._check_wordlist(text, policy)
         
         # 3. Model score with timing
+        if self._is_incremental(text):
+            score, label = self._score_segments(request, policy.name if policy else None)
+            return self._result(request, is_badword, score, label, policy, fuzzy)
+
         inference_start = time.perf_counter()
         score, label = self.adapter.score(text)
         inference_duration = time.perf_counter() - inference_start
         INFERENCE_TIME.observe(inference_duration)
+        WORKER_SECONDS.labels(state="inference").inc(inference_duration)
         
         # 4. Decision logic
-        decision = "allow"
+        return self._result(request, is_badword, score, label, policy, fuzzy)
+
+    def moderate_batch(self, requests: Sequence[ModerationInput]) -> List[CallbackPayload]:
+        """Moderates several requests, scoring all non-trivial texts in one model call."""
+        results: List[Optional[CallbackPayload]] = [None] * len(requests)
+        pending = []
         
-        if is_badword:
-            decision = "block"
-        elif score > settings.BLOCK_THRESHOLD:
-            decision = "block"
-        elif score > settings.FLAG_THRESHOLD:
-            decision = "flag"
+        for i, request in enumerate(requests):
+            if self.is_trivial(request.text):
+                results[i] = self._trivial_result(request)
+            else:
+                pending.append((i, request, self._check_wordlist(request.text)))
+
+        if pending:
+            inference_start = time.perf_counter()
+            scores = self.adapter.score_batch([request.text for _, request, _ in pending])
+            inference_duration = time.perf_counter() - inference_start
+            INFERENCE_TIME.observe(inference_duration)
+            WORKER_SECONDS.labels(state="inference").inc(inference_duration)
             
+            for (i, request, (is_badword, fuzzy)), (score, label) in zip(pending, scores):
+                results[i] = self._result(request, is_badword, score, label, fuzzy=fuzzy)
+
+        return results
+
+    def _is_incremental(self, text: str) -> bool:
+        return settings.INCREMENTAL_ENABLED and len(text) >= settings.INCREMENTAL_MIN_LENGTH
+
+    def _score_segments(self, request: ModerationInput, tenant: Optional[str] = None) -> Tuple[float, str]:
+        """
+        Scores the text sentence by sentence. Sentences already scored for
+        the tenant's request.previous_id (or repeated within the text) are
+        not sent to the model again. The text scores as its most toxic sentence.
+        """
+        previous = self.segment_store.get(request.previous_id, tenant)
+        scores: SegmentScores = {}
+        missing = {}
+        for segment in split_segments(request.text):
+            key = segment_key(segment)
+            if key in previous:
+                scores[key] = previous[key]
+                SEGMENTS_TOTAL.labels(outcome="reused").inc()
+            elif key not in missing:
+                missing[key] = segment
+
+        if missing:
+            inference_start = time.perf_counter()
+            new_scores = self.adapter.score_batch(list(missing.values()))
+            inference_duration = time.perf_counter() - inference_start
+            INFERENCE_TIME.observe(inference_duration)
+            WORKER_SECONDS.labels(state="inference").inc(inference_duration)
+            SEGMENTS_TOTAL.labels(outcome="scored").inc(len(missing))
+            scores.update(zip(missing, new_scores))
+
+        # Failed segments are not cached, so the next version retries them
+        self.segment_store.put(
+            request.id,
+            {key: result for key, result in scores.items() if result[1] != "error"},
+            tenant,
+        )
+        return max(scores.values(), key=lambda result: result[0])
+
+    def _check_wordlist(self, text: str, policy: Optional[TenantPolicy] = None) -> Tuple[bool, bool]:
+        """Returns (exact badword hit, fuzzy-only hit)."""
+        wordlist_start = time.perf_counter()
+        is_badword = wordlist_loader.contains_badword(text, _tenant_words(policy))
+        fuzzy = not is_badword and wordlist_loader.fuzzy_match(text)
+        wordlist_duration = time.perf_counter() - wordlist_start
+        WORDLIST_CHECK_TIME.observe(wordlist_duration)
+        WORKER_SECONDS.labels(state="wordlist").inc(wordlist_duration)
+        return is_badword, fuzzy
+
+    def _trivial_result(self, request: ModerationInput) -> CallbackPayload:
         return CallbackPayload(
             id=request.id,
-            text=text,
-            decision=decision,
+            text=request.text,
+            decision="allow",
+            reason=ModerationReason(
+                badword=False,
+                toxicity_score=0.0,
+                model_label="trivial"
+            )
+        )
+
+    def _result(
+        self,
+        request: ModerationInput,
+        is_badword: bool,
+        score: float,
+        label: str,
+        policy: Optional[TenantPolicy] = None,
+        fuzzy: bool = False,
+    ) -> CallbackPayload:
+        return CallbackPayload(
+            id=request.id,
+            text=request.text,
+            decision=self.decide(is_badword, score, policy, fuzzy),
             reason=ModerationReason(
                 badword=is_badword,
                 toxicity_score=score,
-                model_label=label
+                model_label=label,
+                fuzzy_badword=fuzzy,
             )
         )
 
+def _tenant_words(policy: Optional[TenantPolicy]) -> Optional[CompiledWordlist]:
+    return policy.words if policy else None
+
 # Global instance
 engine = ModerationEngine()
@@ -0,0 +1,155 @@
+"""
+Fuzzy wordlist matching for misspelled and obfuscated badwords.
+
+A SymSpell-style deletion index: every badword is stored under each string
+obtained by deleting up to d of its characters. A token is looked up by
+generating its own deletions, so candidates within edit distance d are
+found with a number of dict lookups that depends only on the token length
+and d, not on the size of the wordlist. Candidates are then verified with
+the optimal string alignment distance, which also counts a swap of two
+adjacent letters ("fcuk") as a single edit.
+
+The allowed distance depends on length (FUZZY_DISTANCES, e.g. "5:1,9:2"):
+both the token and the badword must be long enough for the distance, so
+short words such as "ass" only ever match exactly. Tokens listed in the
+allowlist never match fuzzily. A fuzzy hit only flags a text; blocking is
+left to exact matches and the model.
+"""
+
+import logging
+import os
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.metrics import FUZZY_MATCHES_TOTAL, FUZZY_ALLOWLISTED
+
+logger = logging.getLogger(__name__)
+
+# Starter allowlist of common words that are near-misses of the bundled wordlists
+DEFAULT_ALLOWLIST = os.path.join(os.path.dirname(__file__), "fuzzy_allowlist.txt")
+
+
+def parse_distances(raw: str) -> List[Tuple[int, int]]:
+    """Parses "4:1,9:2" into [(9, 2), (4, 1)] (min length, max distance)."""
+    rules = []
+    for part in raw.split(","):
+        if ":" in part:
+            length, distance = part.split(":", 1)
+            rules.append((int(length), int(distance)))
+    return sorted(rules, reverse=True)
+
+
+def osa_distance(a: str, b: str) -> int:
+    """Optimal string alignment distance (Levenshtein plus adjacent swaps)."""
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+def read_allowlist(path: str) -> Set[str]:
+    if not os.path.exists(path):
+        logger.warning(f"Fuzzy allowlist {path} not found; matching without one")
+        return set()
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        return {line.strip().lower() for line in f if line.strip() and not line.startswith("#")}
+
+
+class FuzzyMatcher:
+    def __init__(
+        self,
+        words: Iterable[str],
+        distances: str,
+        allowlist: Iterable[str] = (),
+        same_first_letter: bool = True,
+        cache_size: int = 65536,
+    ):
+        self.rules = parse_distances(distances)
+        self.allowlist = set(allowlist)
+        self.same_first_letter = same_first_letter
+        self._index: Dict[str, List[str]] = {}
+
+        indexed = 0
+        for word in words:
+            distance = self.max_distance(len(word))
+            # Phrases and entries with digits or symbols are left to the exact checks
+            if distance == 0 or not word.isalpha():
+                continue
+            for variant in _deletes(word, distance):
+                self._index.setdefault(variant, []).append(word)
+            indexed += 1
+        self.word_count = indexed
+
+        # Tokens repeat heavily across messages; most lookups are cache hits
+        self._nearest = lru_cache(maxsize=cache_size)(self._find_nearest)
+
+    def max_distance(self, length: int) -> int:
+        for min_length, distance in self.rules:
+            if length >= min_length:
+                return distance
+        return 0
+
+    def match(self, token: str) -> Optional[str]:
+        """Returns the badword the token is a near-miss of, or None."""
+        found = self._nearest(token)
+        if found is None:
+            return None
+        word, distance = found
+        if token in self.allowlist:
+            FUZZY_ALLOWLISTED.inc()
+            return None
+        FUZZY_MATCHES_TOTAL.labels(distance=str(distance)).inc()
+        logger.debug(f"Fuzzy wordlist match: {token!r} ~ {word!r} (distance {distance})")
+        return word
+
+    def _find_nearest(self, token: str) -> Optional[Tuple[str, int]]:
+        token_distance = self.max_distance(len(token))
+        if token_distance == 0:
+            return None
+
+        best: Optional[Tuple[str, int]] = None
+        seen: Set[str] = set()
+        for variant in _deletes(token, token_distance):
+            for word in self._index.get(variant, ()):
+                if word in seen:
+                    continue
+                seen.add(word)
+                if self.same_first_letter and word[0] != token[0]:
+                    continue
+                limit = min(token_distance, self.max_distance(len(word)))
+                distance = osa_distance(token, word)
+                if distance <= limit and (best is None or distance < best[1]):
+                    best = (word, distance)
+        return best
+
+
+def build_matcher(words: Iterable[str]) -> FuzzyMatcher:
+    allowlist_path = settings.FUZZY_ALLOWLIST_PATH or DEFAULT_ALLOWLIST
+    matcher = FuzzyMatcher(
+        words,
+        settings.FUZZY_DISTANCES,
+        allowlist=read_allowlist(allowlist_path),
+        same_first_letter=settings.FUZZY_SAME_FIRST_LETTER,
+    )
+    logger.info(
+        f"Fuzzy matching enabled for {matcher.word_count} words "
+        f"({settings.FUZZY_DISTANCES}, {len(matcher.allowlist)} allowlisted)"
+    )
+    return matcher
@@ -0,0 +1,158 @@
+"""
+Structured, non-blocking logging.
+
+- Records are handed to a bounded in-process queue; a single listener
+  thread formats and writes them, so request threads never block on
+  stdout. When the queue is full, records are dropped and counted.
+- JSON output is produced with a real encoder (quotes, newlines and
+  unicode in messages stay valid JSON).
+- log_event() emits named high-volume events with per-event sampling
+  (LOG_SAMPLE_RATES) and lazy fields: callables are only evaluated when
+  the event is actually emitted.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.metrics import LOG_RECORDS_DROPPED
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+# =============================================================================
+# Formatters
+# =============================================================================
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with structured fields merged in."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable format for development; structured fields as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {k: v for k, v in vars(record).items() if k not in _RESERVED and not k.startswith("_")}
+
+
+# =============================================================================
+# Non-blocking handler
+# =============================================================================
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same-process listener: no pickling, so skip the eager format that the
+        # base class does and let the listener thread pay for it.
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+def setup_logging():
+    """Configure root logging based on settings."""
+    global _listener
+    log_level = getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO)
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    # JSON format for production (better for log aggregation), text for development
+    stream_handler.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+
+    root = logging.getLogger()
+    root.setLevel(log_level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    if settings.LOG_ASYNC:
+        log_queue: "queue.Queue" = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        root.addHandler(DroppingQueueHandler(log_queue))
+        if _listener is not None:
+            _listener.stop()
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_stop_listener)
+    else:
+        root.addHandler(stream_handler)
+
+    # Reduce noise from third-party libraries
+    logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def _stop_listener():
+    # Flushes whatever is still queued at shutdown
+    if _listener is not None:
+        _listener.stop()
+
+
+# =============================================================================
+# Sampled events
+# =============================================================================
+def _parse_sample_rates(raw: str) -> Dict[str, float]:
+    rates = {}
+    for part in raw.split(","):
+        if "=" in part:
+            event, rate = part.split("=", 1)
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+SAMPLE_RATES = _parse_sample_rates(settings.LOG_SAMPLE_RATES)
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, **fields: Any):
+    """
+    Logs a named event with structured fields.
+
+    Events listed in LOG_SAMPLE_RATES are emitted with that probability and
+    carry a sample_rate field for re-weighting. Callable field values are
+    resolved only if the event is emitted.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    rate = SAMPLE_RATES.get(event, 1.0)
+    if rate < 1.0:
+        if random.random() >= rate:
+            return
+        fields["sample_rate"] = rate
+
+    for key, value in fields.items():
+        if callable(value):
+            fields[key] = value()
+    logger.log(level, event, extra={"event": event, **fields})
@@ -4,53 +4,42 @@ Text Moderation Service - FastAPI Application
 Production-ready API for text moderation with ML-powered toxicity detection.
 """
 
+import hmac
 import logging
-import sys
 import time
 from contextlib import asynccontextmanager
-from typing import Dict
+from typing import Dict, Optional
 
 from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 
 from app.config import settings
-from app.models import ModerationRequest, ModerationResponse
-from app.worker import start_worker, stop_worker, moderation_queue
+from app.log import setup_logging, log_event
+from app.models import ModerationRequest, ModerationResponse, CallbackPayload, PendingResultResponse
+from app.worker import start_worker, stop_worker, enqueue, deliver_result, moderation_queue
 from app.engine import engine
+from app.shadow import shadow_evaluator
+from app.results import result_store
+from app.delivery import callback_dispatcher
+from app.capture import traffic_capture
+from app.tenants import tenant_registry, TenantPolicyUnavailable
+from app import profiling
 from app.metrics import (
     SERVICE_INFO,
     REQUESTS_TOTAL,
     QUEUE_SIZE,
     MODEL_LOADED,
+    RESULT_LOOKUPS_TOTAL,
+    PRELIMINARY_VERDICTS,
 )
 
 
 # =============================================================================
 # Logging Configuration
 # =============================================================================
-def setup_logging():
-    """Configure logging based on settings."""
-    log_level = getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO)
-    
-    if settings.LOG_FORMAT == "json":
-        # JSON format for production (better for log aggregation)
-        log_format = '{"time": "%(asctime)s", "level": "%(levelname)s", "logger": "%(name)s", "message": "%(message)s"}'
-    else:
-        # Human-readable format for development
-        log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    
-    logging.basicConfig(
-        level=log_level,
-        format=log_format,
-        handlers=[logging.StreamHandler(sys.stdout)]
-    )
-    
-    # Reduce noise from third-party libraries
-    logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
-    logging.getLogger("httpx").setLevel(logging.WARNING)
-
 setup_logging()
 logger = logging.getLogger(__name__)
 
@@ -103,17 +92,35 @@ def get_client_ip(request: Request) -> str:
     return request.client.host if request.client else "unknown"
 
 
-async def verify_api_token(request: Request):
-    """Verify API token if configured."""
+async def verify_api_token(request: Request) -> Optional[str]:
+    """
+    Verify API token if configured. Returns the tenant for a tenant token,
+    None for the global API_TOKEN (or when no token is required).
+    """
+    auth_header = request.headers.get("Authorization")
+    # Support both "Bearer <token>" and plain "<token>"
+    token = auth_header.replace("Bearer ", "").strip() if auth_header else ""
+    
+    tenant = tenant_registry.tenant_for_token(token) if token else None
+    if tenant is not None:
+        return tenant
+    
     if settings.API_TOKEN:
-        auth_header = request.headers.get("Authorization")
         if not auth_header:
             raise HTTPException(status_code=401, detail="Authorization header required")
-        
-        # Support both "Bearer <token>" and plain "<token>"
-        token = auth_header.replace("Bearer ", "").strip()
         if token != settings.API_TOKEN:
             raise HTTPException(status_code=401, detail="Invalid API token")
+    return None
+
+
+async def verify_admin_token(request: Request):
+    """Verify the admin token. Admin endpoints are unavailable without one."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    auth_header = request.headers.get("Authorization", "")
+    token = auth_header.replace("Bearer ", "").strip()
+    if not hmac.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
 
 
 async def check_rate_limit(request: Request):
@@ -143,15 +150,26 @@ async def lifespan(app: FastAPI):
             'version': settings.SERVICE_VERSION,
             'model_name': settings.MODEL_NAME,
             'model_backend': settings.MODEL_BACKEND,
+            'shadow_model_name': settings.SHADOW_MODEL_NAME or '',
         })
         
         # Initialize engine (loads model and wordlists)
         engine.initialize()
+        
+        # Tenant token index; policies themselves load on first use
+        tenant_registry.load_index()
         MODEL_LOADED.set(1)
         
-        # Start background worker
+        # Start callback delivery and background worker
+        callback_dispatcher.start()
         start_worker()
         
+        # Start shadow model evaluation (no-op unless SHADOW_ENABLED)
+        shadow_evaluator.start()
+        
+        # Start traffic capture (no-op unless CAPTURE_ENABLED)
+        traffic_capture.start()
+        
         logger.info("Service started successfully")
         
     except Exception as e:
@@ -165,6 +183,9 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down...")
     MODEL_LOADED.set(0)
     stop_worker()
+    shadow_evaluator.stop()
+    callback_dispatcher.stop()
+    traffic_capture.stop()
     logger.info("Service stopped")
 
 
@@ -228,22 +249,94 @@ instrumentator.instrument(app).expose(app, include_in_schema=True, tags=["monito
 @app.post(
     "/moderate",
     response_model=ModerationResponse,
+    response_model_exclude_none=True,
     tags=["moderation"],
     summary="Submit text for moderation",
     dependencies=[Depends(verify_api_token), Depends(check_rate_limit)]
 )
-async def moderate(request: ModerationRequest):
+async def moderate(request: ModerationRequest, tenant: Optional[str] = Depends(verify_api_token)):
     """
     Submit text for asynchronous moderation.
     
-    The result will be sent to the specified callback_url.
+    The result will be sent to the specified callback_url (if any) and can
+    also be fetched from GET /results/{id}.
+    
+    With progressive=true, the wordlist verdict is returned in the response
+    and sent as a "preliminary" callback right away; the model-based
+    "final" verdict follows.
+    
+    Requests made with a tenant token are decided with that tenant's policy.
     """
-    moderation_queue.put(request)
+    traffic_capture.record(request)
+    
+    policy = None
+    if tenant is not None:
+        try:
+            # A miss reads the profile and compiles its words; keep that off the event loop
+            policy = tenant_registry.peek(tenant) or await run_in_threadpool(tenant_registry.get, tenant)
+        except TenantPolicyUnavailable:
+            raise HTTPException(status_code=503, detail="Tenant policy unavailable")
+    
+    preliminary = None
+    if request.progressive:
+        preliminary = engine.precheck(request, policy)
+        is_final = preliminary.phase == "final" or (
+            preliminary.decision == "block" and settings.PROGRESSIVE_SKIP_FINAL_ON_BLOCK
+        )
+        PRELIMINARY_VERDICTS.labels(decision=preliminary.decision, final=str(is_final).lower()).inc()
+        
+        if is_final:
+            # Nothing left for the model to decide
+            preliminary = preliminary.model_copy(update={"phase": "final"})
+            REQUESTS_TOTAL.labels(status="queued").inc()
+            deliver_result(request, preliminary, policy)
+            return ModerationResponse(status="completed", id=request.id, preliminary=preliminary)
+        
+        if request.callback_url:
+            callback_dispatcher.submit(request.callback_url, preliminary)
+    
+    result_store.mark_pending(request.id, tenant)
+    coalesced = not enqueue(request, policy)
     REQUESTS_TOTAL.labels(status="queued").inc()
     QUEUE_SIZE.set(moderation_queue.qsize())
     
-    logger.info(f"Request {request.id} queued for moderation")
-    return ModerationResponse(status="queued", id=request.id)
+    log_event(logger, "request_queued", id=request.id, coalesced=coalesced)
+    return ModerationResponse(status="queued", id=request.id, preliminary=preliminary)
+
+
+@app.get(
+    "/results/{request_id}",
+    response_model=CallbackPayload,
+    tags=["moderation"],
+    summary="Fetch a moderation result",
+    responses={202: {"model": PendingResultResponse}, 404: {"description": "Unknown or expired id"}},
+)
+async def get_result(request_id: str, wait: float = 0.0, tenant: Optional[str] = Depends(verify_api_token)):
+    """
+    Return the verdict for a submitted request.
+    
+    With ?wait=N the call long-polls for up to N seconds (capped at
+    RESULT_LONG_POLL_MAX_SECONDS) until the verdict is ready. Returns 202
+    while the request is still being processed. Tenants only see results
+    of requests submitted with their own token.
+    """
+    timeout = min(max(wait, 0.0), settings.RESULT_LONG_POLL_MAX_SECONDS)
+    if timeout > 0 and result_store.is_pending(request_id, tenant):
+        result = await result_store.wait(request_id, timeout, tenant)
+    else:
+        result = result_store.get(request_id, tenant)
+    
+    if result is not None:
+        RESULT_LOOKUPS_TOTAL.labels(outcome="hit").inc()
+        return result
+    if result_store.is_pending(request_id, tenant):
+        RESULT_LOOKUPS_TOTAL.labels(outcome="pending").inc()
+        return JSONResponse(
+            status_code=202,
+            content=PendingResultResponse(status="pending", id=request_id).model_dump()
+        )
+    RESULT_LOOKUPS_TOTAL.labels(outcome="miss").inc()
+    raise HTTPException(status_code=404, detail="Result not found")
 
 
 @app.get("/healthz", tags=["health"], summary="Liveness probe")
@@ -274,6 +367,43 @@ async def queue_metrics():
     }
 
 
+# =============================================================================
+# Admin endpoints
+# =============================================================================
+@app.post(
+    "/admin/profile",
+    tags=["admin"],
+    summary="Profile the live process",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(verify_admin_token)]
+)
+async def admin_profile(seconds: float = 10.0, torch: bool = False):
+    """
+    Run a time-boxed profile and return collapsed stacks (flamegraph-ready).
+    
+    Samples the Python stacks of all threads; with torch=true the model
+    adapter's scoring calls are also run under torch.profiler.
+    """
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not 0 < seconds <= settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=422, detail=f"seconds must be in (0, {settings.PROFILE_MAX_SECONDS}]")
+    if not profiling.profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    try:
+        stacks = await run_in_threadpool(
+            profiling.run_profile, seconds, settings.PROFILE_SAMPLE_INTERVAL, torch
+        )
+    finally:
+        profiling.profile_lock.release()
+    
+    return PlainTextResponse(
+        profiling.to_collapsed(stacks),
+        headers={"Content-Disposition": f'attachment; filename="profile-{int(time.time())}.folded"'}
+    )
+
+
 # =============================================================================
 # Root endpoint (for quick health check)
 # =============================================================================
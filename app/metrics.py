@@ -20,6 +20,11 @@ REQUESTS_TOTAL = Counter(
     ['status']  # queued, processed, failed
 )
 
+REQUESTS_COALESCED = Counter(
+    'moderation_requests_coalesced_total',
+    'Requests attached to an identical in-flight text instead of being scored again'
+)
+
 # Queue metrics
 QUEUE_SIZE = Gauge(
     'moderation_queue_size',
@@ -45,6 +50,12 @@ WORDLIST_CHECK_TIME = Histogram(
     buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05]
 )
 
+SEGMENTS_TOTAL = Counter(
+    'moderation_segments_total',
+    'Sentence segments of long texts, by whether the score was reused from a previous version',
+    ['outcome']  # reused, scored
+)
+
 # Decision metrics
 DECISIONS_TOTAL = Counter(
     'moderation_decisions_total',
@@ -52,6 +63,24 @@ DECISIONS_TOTAL = Counter(
     ['decision']  # allow, flag, block
 )
 
+TENANT_DECISIONS_TOTAL = Counter(
+    'moderation_tenant_decisions_total',
+    'Moderation decisions for requests authenticated with a tenant token',
+    ['tenant', 'decision']
+)
+
+TENANT_POLICY_CACHE = Counter(
+    'moderation_tenant_policy_cache_total',
+    'Tenant policy lookups: served from cache, loaded and compiled, or failed to load',
+    ['outcome']  # hit, load, error
+)
+
+PRELIMINARY_VERDICTS = Counter(
+    'moderation_preliminary_verdicts_total',
+    'Progressive-mode verdicts issued before model scoring',
+    ['decision', 'final']  # final="true" when no model phase follows
+)
+
 BADWORD_DETECTIONS = Counter(
     'moderation_badword_detections_total',
     'Total number of badword detections'
@@ -68,7 +97,7 @@ TOXICITY_SCORE = Histogram(
 CALLBACKS_TOTAL = Counter(
     'moderation_callbacks_total',
     'Total callback attempts',
-    ['status']  # success, failed
+    ['status']  # success, failed, superseded
 )
 
 CALLBACK_RETRIES = Counter(
@@ -82,12 +111,83 @@ CALLBACK_LATENCY = Histogram(
     buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
 )
 
+# Result store metrics
+RESULT_STORE_SIZE = Gauge(
+    'moderation_result_store_size',
+    'Number of verdicts held in the in-memory result store'
+)
+
+RESULT_LOOKUPS_TOTAL = Counter(
+    'moderation_result_lookups_total',
+    'GET /results lookups by outcome',
+    ['outcome']  # hit, pending, miss
+)
+
+CALLBACK_BREAKER_STATE = Gauge(
+    'moderation_callback_breaker_state',
+    'Callback circuit breaker state per host (0=closed, 1=half-open, 2=open)',
+    ['host']
+)
+
+CALLBACK_DEFERRED = Gauge(
+    'moderation_callback_deferred',
+    'Verdicts parked while the host circuit breaker is open',
+    ['host']
+)
+
+CALLBACK_DEFERRED_DROPPED = Counter(
+    'moderation_callback_deferred_dropped_total',
+    'Parked verdicts dropped because the per-host deferred queue was full'
+)
+
+# Saturation / efficiency metrics
+WORKER_SECONDS = Counter(
+    'moderation_worker_seconds_total',
+    'Moderation worker thread time by state; idle = 1 - rate(busy)',
+    ['state']  # busy (whole job), inference, wordlist
+)
+
+CALLBACK_THREAD_SECONDS = Counter(
+    'moderation_callback_thread_seconds_total',
+    'Callback delivery thread time by state, summed over threads',
+    ['state']  # io, backoff
+)
+
+QUEUE_OLDEST_AGE = Gauge(
+    'moderation_queue_oldest_age_seconds',
+    'Age of the oldest item waiting in the moderation queue'
+)
+
+TOKENS_PROCESSED = Counter(
+    'moderation_tokens_processed_total',
+    'Non-padding tokens run through the model',
+    ['model']
+)
+
+BATCH_PADDING_EFFICIENCY = Histogram(
+    'moderation_batch_padding_efficiency',
+    'Real tokens / padded tokens per inference batch',
+    ['model'],
+    buckets=[0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0]
+)
+
+MODEL_MEMORY_BYTES = Gauge(
+    'moderation_model_memory_bytes',
+    'Bytes held by model parameters and buffers',
+    ['model']
+)
+
 # Model metrics
 MODEL_LOADED = Gauge(
     'moderation_model_loaded',
     'Whether the ML model is loaded (1) or not (0)'
 )
 
+MODEL_LOAD_SECONDS = Gauge(
+    'moderation_model_load_seconds',
+    'Time taken to import and load the primary model at startup'
+)
+
 WORDLISTS_LOADED = Gauge(
     'moderation_wordlists_loaded',
     'Number of wordlists loaded'
@@ -98,3 +198,51 @@ WORDLIST_ENTRIES = Gauge(
     'Total number of entries across all wordlists'
 )
 
+FUZZY_MATCHES_TOTAL = Counter(
+    'moderation_fuzzy_matches_total',
+    'Tokens caught as near-misses of a badword, by edit distance',
+    ['distance']
+)
+
+FUZZY_ALLOWLISTED = Counter(
+    'moderation_fuzzy_allowlisted_total',
+    'Near-miss tokens not flagged because they are on the fuzzy allowlist'
+)
+
+
+# Shadow model metrics (candidate model scored off the critical path)
+SHADOW_INFERENCE_TIME = Histogram(
+    'moderation_shadow_inference_seconds',
+    'Time spent on shadow (candidate) model inference',
+    buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+)
+
+SHADOW_SCORE_DELTA = Histogram(
+    'moderation_shadow_score_delta',
+    'Candidate toxicity score minus primary toxicity score',
+    buckets=[-1.0, -0.5, -0.25, -0.1, -0.05, 0.0, 0.05, 0.1, 0.25, 0.5, 1.0]
+)
+
+SHADOW_DECISIONS_TOTAL = Counter(
+    'moderation_shadow_decisions_total',
+    'Primary vs candidate decision matrix for shadow-scored requests',
+    ['primary', 'candidate']  # allow, flag, block
+)
+
+SHADOW_DROPPED = Counter(
+    'moderation_shadow_dropped_total',
+    'Shadow samples dropped because the shadow queue was full'
+)
+
+# Traffic capture metrics
+CAPTURE_RECORDS_TOTAL = Counter(
+    'moderation_capture_records_total',
+    'Sampled requests written to the traffic capture, or dropped because its queue was full',
+    ['outcome']  # written, dropped
+)
+
+# Logging metrics
+LOG_RECORDS_DROPPED = Counter(
+    'moderation_log_records_dropped_total',
+    'Log records dropped because the async log queue was full'
+)
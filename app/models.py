@@ -1,14 +1,40 @@
-from pydantic import BaseModel, HttpUrl
+import re
+
+from pydantic import BaseModel, HttpUrl, field_validator
 from typing import Optional, Literal
 
+# Ids end up in keys, file names and logs; control characters have no business there
+_CONTROL_CHARS = re.compile(r"[\x00-\x1f\x7f]")
+
 # API Request Models
-class ModerationRequest(BaseModel):
+class ModerationInput(BaseModel):
+    """Text to moderate. Also used directly by the offline bulk CLI."""
     id: str
     text: str
-    callback_url: HttpUrl
+    # Id of the version this text is an edit of; unchanged sentences reuse its scores
+    previous_id: Optional[str] = None
+
+    @field_validator("id", "previous_id")
+    @classmethod
+    def _no_control_chars(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and _CONTROL_CHARS.search(value):
+            raise ValueError("must not contain control characters")
+        return value
+
+class ModerationRequest(ModerationInput):
+    # Optional: without a callback the verdict is only available via GET /results/{id}
+    callback_url: Optional[HttpUrl] = None
+    # Send a preliminary wordlist-based verdict before the model verdict
+    progressive: bool = False
 
 class ModerationResponse(BaseModel):
-    status: Literal["queued"]
+    status: Literal["queued", "completed"]
+    id: str
+    # Progressive requests only: the preliminary (or already final) verdict
+    preliminary: Optional["CallbackPayload"] = None
+
+class PendingResultResponse(BaseModel):
+    status: Literal["pending"]
     id: str
 
 # Callback / Internal Result Models
@@ -16,10 +42,16 @@ class ModerationReason(BaseModel):
     badword: bool
     toxicity_score: float
     model_label: str
+    # Near-miss of a badword (FUZZY_ENABLED); flags but never blocks on its own
+    fuzzy_badword: bool = False
 
 class CallbackPayload(BaseModel):
     id: str
     text: Optional[str] = None
     decision: Literal["allow", "flag", "block"]
     reason: ModerationReason
+    # "preliminary" verdicts come from the wordlist stage only; "final" includes the model
+    phase: Literal["preliminary", "final"] = "final"
+
+ModerationResponse.model_rebuild()
 
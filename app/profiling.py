@@ -0,0 +1,111 @@
+"""
+On-demand profiling of the live process.
+
+POST /admin/profile runs a time-boxed profile and returns collapsed stacks
+("frame;frame;frame count" per line), which flamegraph.pl, speedscope and
+inferno read directly.
+
+- stack: samples every thread's Python stack (worker loop, callbacks,
+  shadow thread, event loop) at PROFILE_SAMPLE_INTERVAL.
+- torch: additionally wraps the primary model adapter in torch.profiler
+  for the duration and appends its operator stacks under a "torch" root.
+
+Nothing is installed until a profile is requested, so there is no
+overhead while the endpoint is idle.
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from app.engine import engine
+
+logger = logging.getLogger(__name__)
+
+# Only one profile may run at a time
+profile_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def sample_stacks(duration: float, interval: float) -> Counter:
+    """Samples all threads except the caller and returns collapsed stack counts."""
+    own_ident = threading.get_ident()
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + duration
+
+    while time.monotonic() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            labels: List[str] = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}"))
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+
+    return stacks
+
+
+class _TorchProfiledAdapter:
+    """Adapter proxy that runs every scoring call under torch.profiler."""
+
+    def __init__(self, adapter):
+        self._adapter = adapter
+        self.stacks: Counter = Counter()
+
+    def _profiled(self, method, *args):
+        from torch.profiler import ProfilerActivity, profile
+
+        with profile(activities=[ProfilerActivity.CPU], with_stack=True) as prof:
+            result = method(*args)
+        with tempfile.NamedTemporaryFile("r", suffix=".folded") as f:
+            prof.export_stacks(f.name, "self_cpu_time_total")
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if stack:
+                    self.stacks[f"torch;{stack}"] += int(count)
+        return result
+
+    def score(self, text: str) -> Tuple[float, str]:
+        return self._profiled(self._adapter.score, text)
+
+    def score_batch(self, texts: List[str]) -> List[Tuple[float, str]]:
+        return self._profiled(self._adapter.score_batch, texts)
+
+    def __getattr__(self, name):
+        return getattr(self._adapter, name)
+
+
+def run_profile(duration: float, interval: float, torch_profile: bool = False) -> Dict[str, int]:
+    """Blocking: profiles the process for duration seconds. Caller holds profile_lock."""
+    proxy = None
+    if torch_profile:
+        proxy = _TorchProfiledAdapter(engine.adapter)
+        engine.adapter = proxy
+
+    try:
+        stacks = sample_stacks(duration, interval)
+    finally:
+        if proxy is not None:
+            engine.adapter = proxy._adapter
+
+    if proxy is not None:
+        stacks.update(proxy.stacks)
+    logger.info(f"Profile finished: {sum(stacks.values())} samples over {duration}s")
+    return stacks
+
+
+def to_collapsed(stacks: Dict[str, int]) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
@@ -0,0 +1,181 @@
+"""
+Bounded result store for callback-free result retrieval.
+
+Verdicts are kept in memory, indexed by (tenant, request id) (see
+tenants.scoped_key), for RESULT_TTL_SECONDS
+and at most RESULT_STORE_MAX_ITEMS entries (oldest evicted first). When
+RESULT_STORE_DIR is set, results are also written there as JSON files so
+they survive restarts and memory eviction.
+
+GET /results/{id} long-polls through wait(): the worker thread resolves
+waiting asyncio futures as soon as the verdict is stored.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.models import CallbackPayload
+from app.tenants import ScopedKey, scoped_key
+from app.metrics import RESULT_STORE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Expired files on disk are swept once every this many stored results
+_SWEEP_EVERY = 1000
+
+
+class ResultStore:
+    def __init__(self, max_items: int, ttl_seconds: float, directory: Optional[str] = None):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._results: "OrderedDict[ScopedKey, Tuple[float, CallbackPayload]]" = OrderedDict()
+        self._pending: "OrderedDict[ScopedKey, float]" = OrderedDict()
+        self._waiters: Dict[ScopedKey, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._puts = 0
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def mark_pending(self, request_id: str, tenant: Optional[str] = None):
+        """Records that a verdict for request_id is on its way."""
+        key = scoped_key(tenant, request_id)
+        with self._lock:
+            self._pending[key] = time.monotonic() + self.ttl_seconds
+            self._pending.move_to_end(key)
+            while len(self._pending) > self.max_items:
+                self._pending.popitem(last=False)
+
+    def is_pending(self, request_id: str, tenant: Optional[str] = None) -> bool:
+        with self._lock:
+            expires_at = self._pending.get(scoped_key(tenant, request_id))
+            return expires_at is not None and expires_at > time.monotonic()
+
+    def put(self, payload: CallbackPayload, tenant: Optional[str] = None):
+        """Stores a verdict and wakes any long-polling readers. Thread-safe."""
+        key = scoped_key(tenant, payload.id)
+        with self._lock:
+            self._results[key] = (time.monotonic() + self.ttl_seconds, payload)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_items:
+                self._results.popitem(last=False)
+            self._pending.pop(key, None)
+            waiters = self._waiters.pop(key, [])
+            self._puts += 1
+            sweep = self.directory is not None and self._puts % _SWEEP_EVERY == 0
+            RESULT_STORE_SIZE.set(len(self._results))
+
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future, payload)
+
+        if self.directory:
+            self._write_file(key, payload)
+            if sweep:
+                self._sweep_files()
+
+    def fail(self, request_id: str, tenant: Optional[str] = None):
+        """Drops the pending mark for a request that will get no verdict and wakes its waiters."""
+        key = scoped_key(tenant, request_id)
+        with self._lock:
+            self._pending.pop(key, None)
+            waiters = self._waiters.pop(key, [])
+
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future, None)
+
+    def get(self, request_id: str, tenant: Optional[str] = None) -> Optional[CallbackPayload]:
+        key = scoped_key(tenant, request_id)
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    return entry[1]
+                del self._results[key]
+        if self.directory:
+            return self._read_file(key)
+        return None
+
+    async def wait(self, request_id: str, timeout: float, tenant: Optional[str] = None) -> Optional[CallbackPayload]:
+        """Returns the verdict, waiting up to timeout seconds for it to arrive."""
+        key = scoped_key(tenant, request_id)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._waiters.setdefault(key, []).append((loop, future))
+
+        # Re-check after registering so a put() racing with us is not missed
+        payload = self.get(request_id, tenant)
+        if payload is None and timeout > 0:
+            try:
+                payload = await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                payload = None
+
+        with self._lock:
+            waiters = self._waiters.get(key)
+            if waiters and (loop, future) in waiters:
+                waiters.remove((loop, future))
+                if not waiters:
+                    del self._waiters[key]
+        return payload
+
+    # -------------------------------------------------------------------------
+    # Disk backing
+    # -------------------------------------------------------------------------
+    def _path(self, key: ScopedKey) -> str:
+        # Canonical encoding of the (tenant, id) pair; no id can produce another tenant's name
+        name = hashlib.sha256(json.dumps(list(key)).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _write_file(self, key: ScopedKey, payload: CallbackPayload):
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload.model_dump_json())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not persist result {payload.id}: {e}")
+
+    def _read_file(self, key: ScopedKey) -> Optional[CallbackPayload]:
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                os.remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return CallbackPayload.model_validate_json(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _sweep_files(self):
+        cutoff = time.time() - self.ttl_seconds
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+        except OSError as e:
+            logger.warning(f"Result store sweep failed: {e}")
+
+
+def _resolve(future: asyncio.Future, payload: Optional[CallbackPayload]):
+    if not future.done():
+        future.set_result(payload)
+
+
+# Global instance
+result_store = ResultStore(
+    max_items=settings.RESULT_STORE_MAX_ITEMS,
+    ttl_seconds=settings.RESULT_TTL_SECONDS,
+    directory=settings.RESULT_STORE_DIR,
+)
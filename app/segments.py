@@ -0,0 +1,67 @@
+"""
+Sentence segmentation and per-segment score cache for incremental
+re-moderation.
+
+Long texts are split into sentences and scored per segment. Segment scores
+are kept for the most recent INCREMENTAL_STORE_SIZE message ids, so when an
+edit arrives with previous_id, only sentences that are new or changed go
+through the model. Ids are scoped by tenant, so previous_id only ever
+refers to the same tenant's messages.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.tenants import ScopedKey, scoped_key
+
+# Sentence end punctuation followed by whitespace, or any line break
+_SEGMENT_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+SegmentScores = Dict[bytes, Tuple[float, str]]
+
+
+def split_segments(text: str) -> List[str]:
+    return [segment.strip() for segment in _SEGMENT_BOUNDARY.split(text) if segment.strip()]
+
+
+def segment_key(segment: str) -> bytes:
+    # Digest instead of the sentence itself keeps the store small
+    return hashlib.blake2b(segment.encode("utf-8"), digest_size=16).digest()
+
+
+class SegmentStore:
+    """Bounded LRU of (tenant, message id) -> segment scores."""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[ScopedKey, SegmentScores]" = OrderedDict()
+
+    def get(self, message_id: Optional[str], tenant: Optional[str] = None) -> SegmentScores:
+        if message_id is None:
+            return {}
+        key = scoped_key(tenant, message_id)
+        with self._lock:
+            scores = self._items.get(key)
+            if scores is None:
+                return {}
+            self._items.move_to_end(key)
+            return scores
+
+    def put(self, message_id: str, scores: SegmentScores, tenant: Optional[str] = None):
+        key = scoped_key(tenant, message_id)
+        with self._lock:
+            self._items[key] = scores
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def alias(self, message_id: str, existing_id: str, tenant: Optional[str] = None):
+        """Makes message_id share the segment scores stored for existing_id (same tenant)."""
+        with self._lock:
+            scores = self._items.get(scoped_key(tenant, existing_id))
+        if scores is not None:
+            self.put(message_id, scores, tenant)
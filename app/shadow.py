@@ -0,0 +1,123 @@
+"""
+Shadow model evaluation.
+
+Mirrors a sample of live traffic to a candidate model on a separate,
+low-priority thread and records its latency, score deltas and decision
+agreement next to the primary model. The primary worker only ever does a
+non-blocking put; when the shadow queue is full the sample is dropped.
+"""
+
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Optional
+
+from app.config import settings
+from app.models import CallbackPayload
+from app.adapters import get_model_adapter, BaseModelAdapter
+from app.engine import engine
+from app.tenants import TenantPolicy
+from app.metrics import (
+    SHADOW_INFERENCE_TIME,
+    SHADOW_SCORE_DELTA,
+    SHADOW_DECISIONS_TOTAL,
+    SHADOW_DROPPED,
+)
+
+logger = logging.getLogger(__name__)
+
+# Labels for which the primary model did not produce a comparable score
+_SKIP_LABELS = {"trivial", "error"}
+
+
+class ShadowEvaluator:
+    def __init__(self):
+        self.adapter: Optional[BaseModelAdapter] = None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=settings.SHADOW_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        """
+        Loads the candidate model and starts the shadow thread. A candidate
+        that fails to load leaves shadow evaluation disabled; it never stops
+        the primary service from starting.
+        """
+        if not settings.SHADOW_ENABLED or not settings.SHADOW_MODEL_NAME:
+            return
+        logger.info(f"Starting shadow evaluation with {settings.SHADOW_MODEL_NAME}")
+        try:
+            self.adapter = get_model_adapter(
+                backend=settings.SHADOW_MODEL_BACKEND,
+                model_name=settings.SHADOW_MODEL_NAME,
+            )
+        except Exception as e:
+            logger.error(f"Could not load shadow model {settings.SHADOW_MODEL_NAME}; shadow evaluation disabled: {e}")
+            self.adapter = None
+            return
+        self._thread = threading.Thread(target=self._run, name="shadow-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._thread = None
+
+    def submit(self, text: str, primary: CallbackPayload, policy: Optional[TenantPolicy] = None):
+        """Offers a scored request to the shadow model. Never blocks."""
+        if self._thread is None or primary.reason.model_label in _SKIP_LABELS:
+            return
+        if random.random() >= settings.SHADOW_SAMPLE_RATE:
+            return
+        try:
+            self._queue.put_nowait((text, primary, policy))
+        except queue.Full:
+            SHADOW_DROPPED.inc()
+
+    def _run(self):
+        self._lower_priority()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._evaluate(*item)
+            except Exception as e:
+                logger.warning(f"Shadow evaluation failed: {e}")
+
+    def _evaluate(self, text: str, primary: CallbackPayload, policy: Optional[TenantPolicy]):
+        start = time.perf_counter()
+        score, label = self.adapter.score(text)
+        SHADOW_INFERENCE_TIME.observe(time.perf_counter() - start)
+        if label == "error":
+            return
+
+        SHADOW_SCORE_DELTA.observe(score - primary.reason.toxicity_score)
+        candidate_decision = engine.decide(primary.reason.badword, score, policy, primary.reason.fuzzy_badword)
+        SHADOW_DECISIONS_TOTAL.labels(
+            primary=primary.decision,
+            candidate=candidate_decision,
+        ).inc()
+
+    @staticmethod
+    def _lower_priority():
+        # On Linux, setpriority on the native thread id renices just this thread,
+        # so the scheduler favours the primary worker when CPU is contended.
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError) as e:
+            logger.debug(f"Could not lower shadow thread priority: {e}")
+
+
+# Global instance
+shadow_evaluator = ShadowEvaluator()
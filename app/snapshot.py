@@ -0,0 +1,153 @@
+"""
+Local, versioned model snapshots for fast offline cold starts.
+
+    python -m app.snapshot                                  # MODEL_NAME
+    python -m app.snapshot --model other/model --keep 2     # e.g. the shadow model
+
+Downloads the model once and writes config, safetensors weights and the
+tokenizer to MODEL_SNAPSHOT_DIR:
+
+    <MODEL_SNAPSHOT_DIR>/<org>--<model>/
+        CURRENT                    name of the active version
+        20260101120000-1a2b3c4d/   config.json, model.safetensors,
+                                   tokenizer files, manifest.json
+
+With MODEL_SNAPSHOT_DIR set, the adapters load the CURRENT version from
+disk with local_files_only: no hub resolution or network calls, and
+safetensors weights are memory-mapped instead of unpickled. A missing or
+mismatched snapshot is a startup error rather than a silent fall back to
+the hub, which would hang in an air-gapped pod. A new
+snapshot is written to a temporary directory and activated by replacing
+CURRENT atomically, so running pods never see a half-written version.
+
+This module must stay light to import: the adapters use resolve() before
+they import transformers.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from typing import Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+CURRENT = "CURRENT"
+
+
+def model_dir(model_name: str, root: str) -> str:
+    # Same flattening as the Hugging Face cache ("org/name" -> "org--name")
+    return os.path.join(root, model_name.replace("/", "--"))
+
+
+def resolve(model_name: str) -> Optional[str]:
+    """
+    Returns the active snapshot directory for model_name, or None if
+    MODEL_SNAPSHOT_DIR is unset. Raises RuntimeError if it is set but has
+    no usable snapshot for model_name.
+    """
+    if not settings.MODEL_SNAPSHOT_DIR:
+        return None
+    # Snapshot mode is offline mode: nothing else in transformers may reach for the hub either
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+    base = model_dir(model_name, settings.MODEL_SNAPSHOT_DIR)
+    try:
+        with open(os.path.join(base, CURRENT), encoding="utf-8") as f:
+            path = os.path.join(base, f.read().strip())
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RuntimeError(
+            f"No usable snapshot for {model_name} in {settings.MODEL_SNAPSHOT_DIR} ({e}); "
+            f"create one with 'python -m app.snapshot --model {model_name}' or unset MODEL_SNAPSHOT_DIR"
+        ) from e
+
+    if manifest.get("model_name") != model_name:
+        raise RuntimeError(f"Snapshot {path} is for {manifest.get('model_name')}, not {model_name}")
+    logger.info(f"Using model snapshot {path} (revision {manifest.get('revision') or 'unknown'})")
+    return path
+
+
+def model_source(model_name: str) -> Tuple[str, dict]:
+    """Where to load model_name from, plus from_pretrained kwargs."""
+    path = resolve(model_name)
+    if path is None:
+        return model_name, {}
+    return path, {"local_files_only": True}
+
+
+def create_snapshot(model_name: str, root: str, keep: int = 3) -> str:
+    """Downloads model_name and activates it as a new snapshot version."""
+    import torch
+    import transformers
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    logger.info(f"Loading {model_name} from the hub")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    revision = getattr(model.config, "_commit_hash", None)
+
+    base = model_dir(model_name, root)
+    os.makedirs(base, exist_ok=True)
+    version = time.strftime("%Y%m%d%H%M%S") + (f"-{revision[:8]}" if revision else "")
+    tmp = os.path.join(base, f".{version}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    model.save_pretrained(tmp, safe_serialization=True)
+    tokenizer.save_pretrained(tmp)
+    manifest = {
+        "model_name": model_name,
+        "revision": revision,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "transformers_version": transformers.__version__,
+        "torch_version": torch.__version__,
+        "files": sorted(os.listdir(tmp)),
+    }
+    with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    os.replace(tmp, os.path.join(base, version))
+    current_tmp = os.path.join(base, f".{CURRENT}.tmp")
+    with open(current_tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(current_tmp, os.path.join(base, CURRENT))
+    logger.info(f"Snapshot {version} of {model_name} is now current")
+
+    _prune(base, version, keep)
+    return os.path.join(base, version)
+
+
+def _prune(base: str, current: str, keep: int):
+    versions = sorted(
+        name for name in os.listdir(base)
+        if not name.startswith(".") and os.path.isdir(os.path.join(base, name))
+    )
+    for name in versions[:max(0, len(versions) - keep)]:
+        if name != current:
+            shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+            logger.info(f"Removed old snapshot {name}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Write a local model snapshot for offline startup.")
+    parser.add_argument("--model", default=settings.MODEL_NAME, help="Model to snapshot (default: MODEL_NAME)")
+    parser.add_argument("--output-dir", default=settings.MODEL_SNAPSHOT_DIR or "./models",
+                        help="Snapshot root (default: MODEL_SNAPSHOT_DIR or ./models)")
+    parser.add_argument("--keep", type=int, default=3, help="Versions to keep, including the new one")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s", stream=sys.stderr)
+    path = create_snapshot(args.model, args.output_dir, max(1, args.keep))
+    print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
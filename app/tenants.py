@@ -0,0 +1,176 @@
+"""
+Per-tenant moderation policies keyed by API token.
+
+One service instance and one model serve every tenant. Model scoring is
+shared; each tenant's policy is applied on top of it:
+
+- extra words, checked after the global wordlists with the same
+  normalization (compiled into the tenant's own in-memory trie)
+- its own block / flag thresholds
+
+Layout of TENANT_POLICY_DIR:
+
+    tokens.json     {"<sha256 of API token>": "<tenant>", ...}
+    <tenant>.json   {"block_threshold": 0.8, "flag_threshold": 0.5,
+                     "words": ["..."], "wordlist_files": ["acme.txt"]}
+
+Only the token index is read at startup. Profiles are loaded and compiled
+on first use and kept in an LRU bounded by TENANT_CACHE_SIZE entries and
+TENANT_CACHE_MAX_BYTES of compiled wordlists (one tenant with a huge list
+weighs as much as many small ones). Loading does file I/O and builds a
+trie, so callers on the event loop use peek() and run get() in a thread
+pool on a miss. Tokens are stored hashed, so the index can be handled like
+ordinary configuration.
+
+Message ids are chosen by clients, so anything keyed by id (stored
+results, segment scores, in-flight texts) is keyed by a (tenant, id)
+tuple from scoped_key(): one tenant can neither read nor overwrite
+another tenant's entries, and no id can spell out another namespace.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError
+
+from app.config import settings
+from app.wordlist_store import CompiledWordlist, read_words
+from app.metrics import TENANT_POLICY_CACHE
+
+logger = logging.getLogger(__name__)
+
+TOKEN_INDEX = "tokens.json"
+
+# (tenant, client key); tenant is None for global-token requests
+ScopedKey = Tuple[Optional[str], str]
+
+
+class TenantProfile(BaseModel):
+    """On-disk profile. Unset thresholds fall back to the global settings."""
+    block_threshold: Optional[float] = None
+    flag_threshold: Optional[float] = None
+    words: List[str] = []
+    wordlist_files: List[str] = []
+
+
+@dataclass
+class TenantPolicy:
+    name: str
+    block_threshold: float
+    flag_threshold: float
+    words: Optional[CompiledWordlist] = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.words.nbytes if self.words is not None else 0
+
+
+class TenantPolicyUnavailable(Exception):
+    pass
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def scoped_key(tenant: Optional[str], key: str) -> ScopedKey:
+    """Namespaces a client-chosen key by tenant. A tuple, so no key can collide across tenants."""
+    return (tenant or None, key)
+
+
+class TenantRegistry:
+    def __init__(self, max_items: int, max_bytes: int):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._tokens: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._policies: "OrderedDict[str, TenantPolicy]" = OrderedDict()
+        self._bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.TENANT_POLICY_DIR)
+
+    def load_index(self):
+        """Reads the token index. Profiles are loaded lazily."""
+        if not self.enabled:
+            return
+        path = os.path.join(settings.TENANT_POLICY_DIR, TOKEN_INDEX)
+        with open(path, encoding="utf-8") as f:
+            tokens = json.load(f)
+        with self._lock:
+            self._tokens = {digest.lower(): name for digest, name in tokens.items()}
+            self._policies.clear()
+            self._bytes = 0
+        logger.info(f"Loaded {len(self._tokens)} tenant tokens for {len(set(self._tokens.values()))} tenants")
+
+    def tenant_for_token(self, token: str) -> Optional[str]:
+        if not self._tokens:
+            return None
+        return self._tokens.get(hash_token(token))
+
+    def peek(self, name: str) -> Optional[TenantPolicy]:
+        """Returns the cached policy without loading it. Safe to call on the event loop."""
+        with self._lock:
+            policy = self._policies.get(name)
+            if policy is not None:
+                self._policies.move_to_end(name)
+                TENANT_POLICY_CACHE.labels(outcome="hit").inc()
+            return policy
+
+    def get(self, name: str) -> TenantPolicy:
+        """Returns the policy, loading and compiling it on a miss (blocking I/O)."""
+        policy = self.peek(name)
+        if policy is not None:
+            return policy
+
+        # Compile outside the lock; a concurrent miss for the same tenant just compiles twice
+        policy = self._load(name)
+        with self._lock:
+            previous = self._policies.pop(name, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._policies[name] = policy
+            self._bytes += policy.nbytes
+            # The newest policy always stays, even if it alone exceeds max_bytes
+            while len(self._policies) > 1 and (
+                len(self._policies) > self.max_items or self._bytes > self.max_bytes
+            ):
+                _, evicted = self._policies.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return policy
+
+    def _load(self, name: str) -> TenantPolicy:
+        base = settings.TENANT_POLICY_DIR
+        try:
+            with open(os.path.join(base, f"{name}.json"), encoding="utf-8") as f:
+                profile = TenantProfile.model_validate(json.load(f))
+            words = [word.strip().lower() for word in profile.words if word.strip()]
+            words.extend(read_words([os.path.join(base, path) for path in profile.wordlist_files]))
+        except (OSError, ValueError, ValidationError) as e:
+            TENANT_POLICY_CACHE.labels(outcome="error").inc()
+            logger.error(f"Failed to load policy for tenant {name}: {e}")
+            raise TenantPolicyUnavailable(name) from e
+
+        TENANT_POLICY_CACHE.labels(outcome="load").inc()
+        logger.info(f"Loaded policy for tenant {name} ({len(set(words))} extra words)")
+        return TenantPolicy(
+            name=name,
+            block_threshold=_or_default(profile.block_threshold, settings.BLOCK_THRESHOLD),
+            flag_threshold=_or_default(profile.flag_threshold, settings.FLAG_THRESHOLD),
+            words=CompiledWordlist.from_words(words) if words else None,
+        )
+
+
+def _or_default(value: Optional[float], default: float) -> float:
+    return default if value is None else value
+
+
+# Global instance
+tenant_registry = TenantRegistry(settings.TENANT_CACHE_SIZE, settings.TENANT_CACHE_MAX_BYTES)
@@ -0,0 +1,217 @@
+"""
+Compiled, memory-mapped wordlist store.
+
+The text wordlists are compiled once into a flat binary trie and loaded
+with mmap, so startup does no parsing and every process maps the same
+read-only pages instead of holding its own copy of a Python set.
+
+File layout (all integers are native-endian uint32):
+
+    header   MAGIC, node_count, edge_count, word_count, max_len, sha256 of sources
+    nodes    edge_start[node_count]
+             edge_info[node_count]      child count | TERMINAL bit
+    edges    edge_label[edge_count]     code point, sorted per node
+             edge_target[edge_count]    child node index
+
+The compiled file is rebuilt only when the checksum of the source files
+changes.
+"""
+
+import bisect
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+from typing import Iterable, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MODWL\x01" + (b"LE" if sys.byteorder == "little" else b"BE")
+HEADER = struct.Struct("=8s4I32s")
+TERMINAL = 1 << 31
+ROOT = 0
+
+
+class CompiledWordlist:
+    """Read-only set-like view over a compiled wordlist buffer."""
+
+    def __init__(self, buffer: Union[bytes, mmap.mmap]):
+        magic, nodes, edges, words, max_len, checksum = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a compiled wordlist (or built on a different byte order)")
+        expected = HEADER.size + 4 * (2 * nodes + 2 * edges)
+        if len(buffer) != expected:
+            raise ValueError(f"Compiled wordlist is {len(buffer)} bytes, expected {expected} (truncated or corrupt)")
+
+        self._buffer = buffer
+        self.node_count = nodes
+        self.word_count = words
+        self.max_len = max_len
+        self.checksum = checksum.hex()
+
+        ints = memoryview(buffer)[HEADER.size:].cast("I")
+        self._edge_start = ints[0:nodes]
+        self._edge_info = ints[nodes:2 * nodes]
+        self._edge_label = ints[2 * nodes:2 * nodes + edges]
+        self._edge_target = ints[2 * nodes + edges:2 * nodes + 2 * edges]
+
+        # The first trie level is hit for every text position, so keep it as a dict
+        start = self._edge_start[ROOT]
+        end = start + (self._edge_info[ROOT] & ~TERMINAL)
+        self._root_children = {
+            chr(self._edge_label[i]): self._edge_target[i] for i in range(start, end)
+        }
+
+    # -------------------------------------------------------------------------
+    # Loading / building
+    # -------------------------------------------------------------------------
+    @classmethod
+    def open(cls, path: str) -> "CompiledWordlist":
+        """Maps a compiled file read-only. Pages are shared between processes."""
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def from_words(cls, words: Iterable[str], checksum: bytes = b"") -> "CompiledWordlist":
+        """Compiles words into an in-memory store (no file involved)."""
+        return cls(build(words, checksum))
+
+    # -------------------------------------------------------------------------
+    # Lookups
+    # -------------------------------------------------------------------------
+    def _child(self, node: int, char: str) -> Optional[int]:
+        start = self._edge_start[node]
+        end = start + (self._edge_info[node] & ~TERMINAL)
+        code = ord(char)
+        i = bisect.bisect_left(self._edge_label, code, start, end)
+        if i < end and self._edge_label[i] == code:
+            return self._edge_target[i]
+        return None
+
+    def __contains__(self, word: object) -> bool:
+        if not isinstance(word, str):
+            return False
+        node = ROOT
+        for char in word:
+            node = self._child(node, char)
+            if node is None:
+                return False
+        return bool(self._edge_info[node] & TERMINAL)
+
+    def __len__(self) -> int:
+        return self.word_count
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the compiled buffer."""
+        return len(self._buffer)
+
+    def __iter__(self) -> Iterator[str]:
+        stack = [(ROOT, "")]
+        while stack:
+            node, prefix = stack.pop()
+            info = self._edge_info[node]
+            if info & TERMINAL:
+                yield prefix
+            start = self._edge_start[node]
+            for i in range(start + (info & ~TERMINAL) - 1, start - 1, -1):
+                stack.append((self._edge_target[i], prefix + chr(self._edge_label[i])))
+
+    def find_substring(self, text: str, min_len: int = 1) -> bool:
+        """True if any word of at least min_len characters occurs inside text."""
+        root_children = self._root_children
+        edge_info = self._edge_info
+        for i, first in enumerate(text):
+            node = root_children.get(first)
+            if node is None:
+                continue
+            if min_len <= 1 and edge_info[node] & TERMINAL:
+                return True
+            for depth in range(2, min(self.max_len, len(text) - i) + 1):
+                node = self._child(node, text[i + depth - 1])
+                if node is None:
+                    break
+                if depth >= min_len and edge_info[node] & TERMINAL:
+                    return True
+        return False
+
+
+def build(words: Iterable[str], checksum: bytes = b"") -> bytes:
+    """Serializes words into the compiled trie format."""
+    unique = sorted(set(w for w in words if w))
+
+    # Nested dict trie; None key marks the end of a word
+    root: dict = {}
+    for word in unique:
+        node = root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[None] = True
+
+    # Breadth-first layout so each node's children are contiguous
+    order: List[dict] = [root]
+    edge_start: List[int] = []
+    edge_info: List[int] = []
+    edge_label: List[int] = []
+    edge_target: List[int] = []
+    for node in order:
+        children = sorted((c, child) for c, child in node.items() if c is not None)
+        edge_start.append(len(edge_label))
+        edge_info.append(len(children) | (TERMINAL if None in node else 0))
+        for char, child in children:
+            edge_label.append(ord(char))
+            edge_target.append(len(order))
+            order.append(child)
+
+    header = HEADER.pack(
+        MAGIC,
+        len(order),
+        len(edge_label),
+        len(unique),
+        max((len(w) for w in unique), default=0),
+        checksum.ljust(32, b"\0")[:32],
+    )
+    body = struct.pack(f"={len(order) * 2 + len(edge_label) * 2}I", *edge_start, *edge_info, *edge_label, *edge_target)
+    return header + body
+
+
+def source_checksum(paths: List[str]) -> bytes:
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.digest()
+
+
+def read_words(paths: List[str]) -> Iterator[str]:
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                word = line.strip().lower()
+                if word:
+                    yield word
+
+
+def compile_wordlists(paths: List[str], target: str) -> CompiledWordlist:
+    """Opens target, rebuilding it first if it is missing or the sources changed."""
+    checksum = source_checksum(paths)
+
+    if os.path.exists(target):
+        try:
+            store = CompiledWordlist.open(target)
+            if store.checksum == checksum.hex():
+                return store
+        except (ValueError, struct.error) as e:
+            logger.warning(f"Ignoring unreadable compiled wordlist {target}: {e}")
+
+    logger.info(f"Compiling {len(paths)} wordlists into {target}")
+    data = build(read_words(paths), checksum)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    # Atomic swap: processes that already mapped the old file keep a valid view
+    os.replace(tmp_path, target)
+    return CompiledWordlist.open(target)
@@ -1,28 +1,58 @@
 import queue
 import threading
 import time
-import requests
 import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 from app.config import settings
+from app.log import log_event
 from app.models import ModerationRequest, CallbackPayload
 from app.engine import engine
+from app.shadow import shadow_evaluator
+from app.results import result_store
+from app.delivery import callback_dispatcher
+from app.tenants import ScopedKey, TenantPolicy, scoped_key
 from app.metrics import (
     REQUESTS_TOTAL,
     QUEUE_SIZE,
     PROCESSING_TIME,
     DECISIONS_TOTAL,
+    TENANT_DECISIONS_TOTAL,
     BADWORD_DETECTIONS,
     TOXICITY_SCORE,
-    CALLBACKS_TOTAL,
-    CALLBACK_RETRIES,
-    CALLBACK_LATENCY,
+    REQUESTS_COALESCED,
+    WORKER_SECONDS,
+    QUEUE_OLDEST_AGE,
 )
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class Job:
+    """A queued computation. Followers are identical texts that share its score."""
+    request: ModerationRequest
+    key: Optional[ScopedKey]
+    followers: List[ModerationRequest] = field(default_factory=list)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # Tenant policy applied after scoring; None = global settings
+    policy: Optional[TenantPolicy] = None
+
 # Global queue
 moderation_queue = queue.Queue()
 
+# In-flight jobs by coalescing key (queued or being scored)
+_inflight: Dict[ScopedKey, Job] = {}
+_inflight_lock = threading.Lock()
+
+def _oldest_queued_age() -> float:
+    try:
+        oldest = moderation_queue.queue[0]
+    except IndexError:
+        return 0.0
+    return time.monotonic() - oldest.enqueued_at if oldest is not None else 0.0
+
+QUEUE_OLDEST_AGE.set_function(_oldest_queued_age)
+
 def process_queue():
     """Worker loop."""
     logger.info("Worker thread started.")
@@ -30,6 +60,7 @@ def process_queue():
         try:
             # Blocking get
             item = moderation_queue.get()
+            busy_start = time.perf_counter()
             if item is None:
                 # Sentinel to stop
                 break
@@ -39,6 +70,7 @@ def process_queue():
             
             process_request(item)
             moderation_queue.task_done()
+            WORKER_SECONDS.labels(state="busy").inc(time.perf_counter() - busy_start)
             
             # Update queue size after processing
             QUEUE_SIZE.set(moderation_queue.qsize())
@@ -46,63 +78,101 @@ def process_queue():
             logger.error(f"Error in worker loop: {e}")
             REQUESTS_TOTAL.labels(status="failed").inc()
 
-def process_request(request: ModerationRequest):
+def enqueue(request: ModerationRequest, policy: Optional[TenantPolicy] = None) -> bool:
+    """
+    Queues a request, or attaches it to an identical text of the same tenant
+    that is already queued or being scored (singleflight). Returns False
+    when coalesced.
+    """
+    if not settings.COALESCE_ENABLED:
+        moderation_queue.put(Job(request=request, key=None, policy=policy))
+        return True
+
+    key = coalesce_key(request.text, policy.name if policy else None)
+    with _inflight_lock:
+        job = _inflight.get(key)
+        if job is not None:
+            job.followers.append(request)
+            REQUESTS_COALESCED.inc()
+            return False
+        job = Job(request=request, key=key, policy=policy)
+        _inflight[key] = job
+    moderation_queue.put(job)
+    return True
+
+def coalesce_key(text: str, tenant: Optional[str] = None) -> ScopedKey:
+    # Whitespace runs do not change the model's tokens, so texts that differ only
+    # in whitespace share a computation. Case is kept: the model is cased.
+    # Tenants get separate keys because their policies decide differently.
+    return scoped_key(tenant, " ".join(text.split()))
+
+def process_request(job: Job):
     start_time = time.perf_counter()
+    request = job.request
     try:
-        logger.info(f"Processing request {request.id}")
-        result = engine.moderate(request)
-        
-        # Record processing time
-        processing_duration = time.perf_counter() - start_time
-        PROCESSING_TIME.observe(processing_duration)
-        
-        # Record decision metrics
-        DECISIONS_TOTAL.labels(decision=result.decision).inc()
-        TOXICITY_SCORE.observe(result.reason.toxicity_score)
-        
-        if result.reason.badword:
-            BADWORD_DETECTIONS.inc()
-        
-        REQUESTS_TOTAL.labels(status="processed").inc()
-        
-        send_callback(request.callback_url, result)
+        log_event(logger, "request_processing", id=request.id, followers=lambda: len(job.followers))
+        result = engine.moderate(request, job.policy)
     except Exception as e:
         logger.error(f"Failed to process request {request.id}: {e}")
-        REQUESTS_TOTAL.labels(status="failed").inc()
-
-def send_callback(url: str, payload: CallbackPayload):
-    payload_dict = payload.model_dump(mode="json")
+        failed = [request] + _detach(job)
+        REQUESTS_TOTAL.labels(status="failed").inc(len(failed))
+        # No verdict is coming: GET /results answers 404 instead of 202 until the TTL
+        for target in failed:
+            result_store.fail(target.id, _tenant(job.policy))
+        return
     
-    for attempt in range(settings.MAX_RETRIES):
-        callback_start = time.perf_counter()
+    # Record processing time
+    processing_duration = time.perf_counter() - start_time
+    PROCESSING_TIME.observe(processing_duration)
+
+    # Fan the shared score out to the leader and every coalesced follower
+    for target in [request] + _detach(job):
+        if target is not request:
+            # Later edits of a follower can reuse the leader's sentence scores
+            engine.segment_store.alias(target.id, request.id, _tenant(job.policy))
         try:
-            response = requests.post(str(url), json=payload_dict, timeout=10)
-            callback_duration = time.perf_counter() - callback_start
-            CALLBACK_LATENCY.observe(callback_duration)
-            
-            if 200 <= response.status_code < 300:
-                logger.info(f"Callback successful for {payload.id}")
-                CALLBACKS_TOTAL.labels(status="success").inc()
-                return
-            else:
-                logger.warning(f"Callback failed for {payload.id} (status {response.status_code}). Attempt {attempt + 1}/{settings.MAX_RETRIES}")
-                if attempt < settings.MAX_RETRIES - 1:
-                    CALLBACK_RETRIES.inc()
+            deliver_result(target, result, job.policy)
         except Exception as e:
-            callback_duration = time.perf_counter() - callback_start
-            CALLBACK_LATENCY.observe(callback_duration)
-            logger.warning(f"Callback exception for {payload.id}: {e}. Attempt {attempt + 1}/{settings.MAX_RETRIES}")
-            if attempt < settings.MAX_RETRIES - 1:
-                CALLBACK_RETRIES.inc()
-        
-        # Backoff
-        time.sleep(settings.RETRY_BACKOFF_FACTOR ** attempt)
+            logger.error(f"Failed to deliver result for {target.id}: {e}")
+            REQUESTS_TOTAL.labels(status="failed").inc()
+
+    # Mirror to the candidate model after the verdict is out (non-blocking)
+    shadow_evaluator.submit(request.text, result, job.policy)
+
+def deliver_result(request: ModerationRequest, result: CallbackPayload, policy: Optional[TenantPolicy] = None):
+    if result.id != request.id:
+        result = result.model_copy(update={"id": request.id, "text": request.text})
+    
+    # Record decision metrics
+    DECISIONS_TOTAL.labels(decision=result.decision).inc()
+    if policy is not None:
+        TENANT_DECISIONS_TOTAL.labels(tenant=policy.name, decision=result.decision).inc()
+    TOXICITY_SCORE.observe(result.reason.toxicity_score)
     
-    logger.error(f"All callback attempts failed for {payload.id}")
-    CALLBACKS_TOTAL.labels(status="failed").inc()
+    if result.reason.badword:
+        BADWORD_DETECTIONS.inc()
+    
+    REQUESTS_TOTAL.labels(status="processed").inc()
+    
+    # Store first so long-polling clients get the verdict without waiting on the webhook
+    result_store.put(result, _tenant(policy))
+    if request.callback_url:
+        callback_dispatcher.submit(request.callback_url, result)
+
+def _tenant(policy: Optional[TenantPolicy]) -> Optional[str]:
+    return policy.name if policy else None
+
+def _detach(job: Job) -> List[ModerationRequest]:
+    """Removes the job from the in-flight map; no follower can attach after this."""
+    if job.key is None:
+        return []
+    with _inflight_lock:
+        if _inflight.get(job.key) is job:
+            del _inflight[job.key]
+        return list(job.followers)
 
 def start_worker():
-    t = threading.Thread(target=process_queue, daemon=True)
+    t = threading.Thread(target=process_queue, name="moderation-worker", daemon=True)
     t.start()
     return t
 
@@ -0,0 +1,100 @@
+"""
+Parity check and latency benchmark: torch backend vs. pipeline backend.
+
+Loads MODEL_NAME with both HuggingFacePipelineAdapter and TorchAdapter
+(honouring the TORCH_* settings), verifies that scores and labels agree
+within a tolerance, and reports single-text and batched latency.
+
+    python benchmark_adapters.py
+    TORCH_QUANTIZE_INT8=true python benchmark_adapters.py --tolerance 0.05
+
+Exits non-zero when parity fails.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+from app.config import settings
+from app.adapters import HuggingFacePipelineAdapter, TorchAdapter
+
+TEXTS = [
+    "Hei, mitä kuuluu? Tämä on tavallinen viesti.",
+    "Opettajat on tosi tyhmiä",
+    "Haista viddu",
+    "Kiitos avusta, tämä toimi hienosti!",
+    "You are an absolute idiot and everyone hates you.",
+    "The meeting is moved to Thursday at 10am.",
+    "Tää peli on ihan paskaa ja kehittäjät on idiootteja",
+    "Nice work on the release, the new dashboard looks great.",
+    "Mene pois, kukaan ei halua sinua tänne.",
+    "Lorem ipsum dolor sit amet, " * 30,
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def time_calls(fn, rounds):
+    durations = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def report(name, durations, items_per_call=1):
+    p50 = statistics.median(durations) * 1000
+    p95 = percentile(durations, 95) * 1000
+    throughput = items_per_call * len(durations) / sum(durations)
+    print(f"{name:<28} p50 {p50:8.1f} ms   p95 {p95:8.1f} ms   {throughput:8.1f} texts/s")
+    return p50
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tolerance", type=float, default=1e-3, help="Max allowed absolute score difference")
+    parser.add_argument("--rounds", type=int, default=20, help="Timed rounds per measurement")
+    args = parser.parse_args()
+
+    print(f"Model: {settings.MODEL_NAME}")
+    pipeline_adapter = HuggingFacePipelineAdapter(settings.MODEL_NAME, settings.MODEL_DEVICE)
+    torch_adapter = TorchAdapter(settings.MODEL_NAME, settings.MODEL_DEVICE)
+
+    # 1. Parity
+    print("\n[*] Parity")
+    failures = 0
+    for text, batched in zip(TEXTS, torch_adapter.score_batch(TEXTS)):
+        expected = pipeline_adapter.score(text)
+        single = torch_adapter.score(text)
+        ok = all(
+            abs(got[0] - expected[0]) <= args.tolerance and got[1] == expected[1]
+            for got in (single, batched)
+        )
+        failures += not ok
+        status = "PASS" if ok else "FAIL"
+        print(f"{status}  pipeline {expected[0]:.4f} {expected[1]:<8}  torch {single[0]:.4f} {single[1]:<8}  batch {batched[0]:.4f}  | {text[:40]!r}")
+
+    # 2. Latency
+    print("\n[*] Latency")
+    for adapter in (pipeline_adapter, torch_adapter):
+        adapter.score(TEXTS[0])  # warm-up
+    base = report("pipeline score()", time_calls(lambda: [pipeline_adapter.score(t) for t in TEXTS], args.rounds), len(TEXTS))
+    fast = report("torch score()", time_calls(lambda: [torch_adapter.score(t) for t in TEXTS], args.rounds), len(TEXTS))
+    report("pipeline score_batch()", time_calls(lambda: pipeline_adapter.score_batch(TEXTS), args.rounds), len(TEXTS))
+    report("torch score_batch()", time_calls(lambda: torch_adapter.score_batch(TEXTS), args.rounds), len(TEXTS))
+    print(f"\nSingle-text speedup: {base / fast:.2f}x")
+
+    if failures:
+        print(f"\n[FAIL] {failures} score(s) outside tolerance {args.tolerance}")
+        return 1
+    print("\n[OK] Torch backend matches pipeline backend")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
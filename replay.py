@@ -0,0 +1,206 @@
+"""
+Replay captured production traffic against a running service.
+
+Reads capture files written with CAPTURE_ENABLED (see app/capture.py) and
+sends the requests to POST /moderate in arrival order, keeping the
+original spacing scaled by --speed. Callbacks go to a local stand-in sink
+started by this script, so every request is measured up to its final
+verdict, even if it was captured without a callback_url.
+
+    python replay.py captures/moderate.jsonl*
+    python replay.py captures/moderate.jsonl --speed 10
+    python replay.py captures/moderate.jsonl --speed max --concurrency 128
+    python replay.py captures/*.jsonl* --url http://moderation:8000 \\
+        --sink-url http://loadgen:9100
+
+Reports throughput and p50/p90/p99 latency for submission (HTTP response)
+and verdict (final callback received). Exits non-zero when requests fail
+or verdicts are missing after --drain-timeout.
+
+Ids are rewritten as "<run>-<n>" so runs do not collide in the result
+store; previous_id references are rewritten to match. Texts captured in
+hash mode are replaced with filler of the same length; identical hashes
+get identical filler, so duplicate rates are preserved.
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+FILLER_WORDS = (
+    "tämä on viesti joka sisältää tavallista tekstiä ja hieman lisää sanoja "
+    "this is a message with some ordinary text and a few more words"
+).split()
+
+
+def load_capture(paths):
+    entries = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            entries.extend(json.loads(line) for line in f if line.strip())
+    entries.sort(key=lambda entry: entry["ts"])
+    return entries
+
+
+def entry_text(entry) -> str:
+    if "text" in entry:
+        return entry["text"]
+    rng = random.Random(entry["text_hash"])
+    words = []
+    while sum(len(word) + 1 for word in words) < entry["length"]:
+        words.append(rng.choice(FILLER_WORDS))
+    return " ".join(words)[:entry["length"]]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class CallbackSink:
+    """Local HTTP server standing in for integrators' callback endpoints."""
+
+    def __init__(self, host: str, port: int):
+        self.verdicts = {}
+        self._lock = threading.Lock()
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                received_at = time.perf_counter()
+                self.send_response(200)
+                self.end_headers()
+                payload = json.loads(body)
+                if payload.get("phase", "final") == "final":
+                    with sink._lock:
+                        sink.verdicts.setdefault(payload["id"], received_at)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self.verdicts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", nargs="+", help="Capture file(s), including rotated ones")
+    parser.add_argument("--url", default="http://localhost:8000", help="Service base URL")
+    parser.add_argument("--token", help="API token (Bearer)")
+    parser.add_argument("--speed", default="1", help="Playback speed: 1, N (e.g. 10) or max")
+    parser.add_argument("--concurrency", type=int, default=64, help="Max requests in flight")
+    parser.add_argument("--limit", type=int, help="Replay only the first N requests")
+    parser.add_argument("--sink-host", default="0.0.0.0", help="Callback sink bind address")
+    parser.add_argument("--sink-port", type=int, default=9100, help="Callback sink port")
+    parser.add_argument("--sink-url", help="Callback base URL as seen from the service (default http://127.0.0.1:<sink-port>)")
+    parser.add_argument("--drain-timeout", type=float, default=60.0, help="Seconds to wait for outstanding verdicts")
+    args = parser.parse_args()
+
+    speed = None if args.speed == "max" else float(args.speed)
+    entries = load_capture(args.capture)[:args.limit]
+    if not entries:
+        print("Capture is empty", file=sys.stderr)
+        return 1
+
+    run = uuid.uuid4().hex[:8]
+    callback_url = (args.sink_url or f"http://127.0.0.1:{args.sink_port}").rstrip("/") + "/callback"
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+
+    # Build the request bodies up front so pacing is not affected by it
+    sent_ids = {}
+    bodies = []
+    for n, entry in enumerate(entries):
+        body = {"id": f"{run}-{n}", "text": entry_text(entry), "callback_url": callback_url}
+        if entry.get("progressive"):
+            body["progressive"] = True
+        if entry.get("previous_id") in sent_ids:
+            body["previous_id"] = sent_ids[entry["previous_id"]]
+        sent_ids[entry["id"]] = body["id"]
+        bodies.append(body)
+
+    sink = CallbackSink(args.sink_host, args.sink_port)
+    sink.start()
+
+    session_local = threading.local()
+    sent_at = {}
+    submit_latencies = []
+    failures = []
+    lags = []
+
+    def send(body, due):
+        session = getattr(session_local, "session", None)
+        if session is None:
+            session = session_local.session = requests.Session()
+        start = time.perf_counter()
+        sent_at[body["id"]] = start
+        if due is not None and start - due > 0.01:
+            lags.append(start - due)
+        try:
+            response = session.post(f"{args.url}/moderate", json=body, headers=headers, timeout=30)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        submit_latencies.append(time.perf_counter() - start)
+        if not ok:
+            failures.append(body["id"])
+
+    pace = f"{speed:g}x" if speed else "max speed"
+    print(f"Replaying {len(bodies)} requests at {pace} (run {run})", file=sys.stderr)
+    origin_ts = entries[0]["ts"]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for entry, body in zip(entries, bodies):
+            due = None
+            if speed:
+                due = started + (entry["ts"] - origin_ts) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            executor.submit(send, body, due)
+    sending_done = time.perf_counter()
+
+    expected = len(bodies) - len(failures)
+    deadline = time.monotonic() + args.drain_timeout
+    while sink.count() < expected and time.monotonic() < deadline:
+        time.sleep(0.05)
+    sink.stop()
+
+    verdicts = dict(sink.verdicts)
+    verdict_latencies = [verdicts[i] - sent_at[i] for i in verdicts if i in sent_at]
+    finished = max(verdicts.values(), default=sending_done)
+    missing = expected - len(verdict_latencies)
+
+    print(f"\nRequests:          {len(bodies)} sent, {len(failures)} failed, {missing} without verdict")
+    print(f"Wall time:         {finished - started:.1f} s (sending {sending_done - started:.1f} s)")
+    print(f"Throughput:        {len(verdict_latencies) / max(finished - started, 1e-9):.1f} verdicts/s")
+    if lags:
+        print(f"Behind schedule:   {len(lags)} requests >10 ms late, max {max(lags) * 1000:.0f} ms (raise --concurrency?)")
+    for name, values in (("Submit latency", submit_latencies), ("Verdict latency", verdict_latencies)):
+        if values:
+            p50, p90, p99 = (percentile(values, p) * 1000 for p in (50, 90, 99))
+            print(f"{name + ':':<18} p50 {p50:8.1f} ms   p90 {p90:8.1f} ms   p99 {p99:8.1f} ms")
+
+    return 1 if failures or missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
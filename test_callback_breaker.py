@@ -0,0 +1,100 @@
+"""
+Checks that one unresponsive callback host does not starve the others.
+
+Runs the callback dispatcher in-process against two local stub hosts:
+
+- a "down" host that accepts connections but never answers within
+  CALLBACK_TIMEOUT (1 s), with 40 verdicts queued for it
+- a healthy host with 4 verdicts, submitted after the down host's
+
+The healthy host must receive all of its callbacks promptly, and the down
+host must stop seeing attempts once its breaker has opened.
+
+    python test_callback_breaker.py
+"""
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("MODEL_BACKEND", "dummy")
+os.environ["CALLBACK_TIMEOUT"] = "1"
+os.environ["MAX_RETRIES"] = "3"
+os.environ["CB_OPEN_SECONDS"] = "60"
+
+from app.delivery import callback_dispatcher  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.models import CallbackPayload, ModerationReason  # noqa: E402
+
+DOWN_VERDICTS = 40
+HEALTHY_VERDICTS = 4
+HEALTHY_DEADLINE = 3.0
+
+
+def start_stub(delay: float):
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            hits.append(time.perf_counter())
+            time.sleep(delay)
+            try:
+                self.send_response(200)
+                self.end_headers()
+            except OSError:
+                pass  # Client gave up (timeout)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/callback", hits
+
+
+def payload(message_id: str) -> CallbackPayload:
+    reason = ModerationReason(badword=False, toxicity_score=0.0, model_label="neutral")
+    return CallbackPayload(id=message_id, decision="allow", reason=reason)
+
+
+def main() -> int:
+    down_url, down_hits = start_stub(delay=30.0)
+    healthy_url, healthy_hits = start_stub(delay=0.0)
+    callback_dispatcher.start()
+
+    started = time.perf_counter()
+    for n in range(DOWN_VERDICTS):
+        callback_dispatcher.submit(down_url, payload(f"down-{n}"))
+    for n in range(HEALTHY_VERDICTS):
+        callback_dispatcher.submit(healthy_url, payload(f"healthy-{n}"))
+
+    deadline = started + HEALTHY_DEADLINE
+    while len(healthy_hits) < HEALTHY_VERDICTS and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    healthy_elapsed = time.perf_counter() - started
+
+    # Give the down host's in-flight attempts time to time out and its breaker time to park the rest
+    time.sleep(settings.CALLBACK_TIMEOUT * (settings.CB_MIN_CALLS + 2))
+    callback_dispatcher.stop()
+
+    max_down_attempts = settings.CB_MIN_CALLS + settings.CALLBACK_MAX_PER_HOST
+    print(f"Healthy host: {len(healthy_hits)}/{HEALTHY_VERDICTS} callbacks after {healthy_elapsed:.1f}s")
+    print(f"Down host:    {len(down_hits)} attempts for {DOWN_VERDICTS} verdicts (limit {max_down_attempts})")
+
+    ok = True
+    if len(healthy_hits) < HEALTHY_VERDICTS:
+        print(f"FAIL: healthy host starved (expected {HEALTHY_VERDICTS} callbacks within {HEALTHY_DEADLINE:.0f}s)")
+        ok = False
+    if len(down_hits) > max_down_attempts:
+        print("FAIL: queued verdicts kept hitting the down host after its breaker opened")
+        ok = False
+    print("PASS" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
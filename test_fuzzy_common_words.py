@@ -0,0 +1,114 @@
+"""
+Checks that fuzzy wordlist matching leaves everyday words alone.
+
+Builds the fuzzy matcher from the wordlists in WORDLIST_DIR with the
+configured FUZZY_DISTANCES and allowlist, runs it over a list of common
+English and Finnish words and fails on any hit. Run it after changing the
+wordlists, the allowlist or FUZZY_DISTANCES:
+
+    python test_fuzzy_common_words.py
+    python test_fuzzy_common_words.py --distances 4:1,9:2
+    python test_fuzzy_common_words.py --words my_words.txt   # one word per line
+"""
+
+import argparse
+import os
+import sys
+
+os.environ.setdefault("MODEL_BACKEND", "dummy")
+os.environ["FUZZY_ENABLED"] = "true"
+
+from app.config import settings  # noqa: E402
+from app.fuzzy import build_matcher  # noqa: E402
+from app.wordlist import wordlist_loader  # noqa: E402
+
+COMMON_WORDS = """
+about above accept across act add afraid after again against age ago agree air all allow almost alone along already
+also always among amount and animal another answer any apple area arm army around arrive art ask attack aunt away
+baby back bad bag bake ball band bank bar base basket bath batch battle beach bear beat because bed beef been beer
+before begin behind believe bell belong below belt bench best better between big bill bird birth bit bite bitter black
+blade blank blast blind block blood blow blue board boat body boil bone book boot border born both bottle bottom bowl
+box boy brain branch brand brave bread break breath brick bridge brief bright bring broad brother brown brush build
+bunch burn bush busy butter button buy cake call calm camera camp can candle cap capital captain car card care carry
+case cash cast castle cat catch cattle cause cent center chain chair chalk chance change charge chart cheap check
+cheese chest chicken chief child chin choice church circle city claim class clean clear clerk click climb clock close
+cloth cloud club coach coal coast coat code coffee coin cold collar collect colour comb come common cook cool copper
+copy cord corn corner cost cotton cough count country course court cousin cover cow crack crash cream credit crew
+crop cross crowd crown cry cup cure curtain curve cushion custom cut damage dance danger dark date daughter day dead
+deal dear debt deck deep deer degree desk detail dinner dirt dish ditch dock doctor dog doll door double doubt down
+draft drag drain drama draw dream dress drink drive drop drum dry duck dust duty early earth east easy eat edge egg
+eight either elbow else empty end enemy engine enjoy enough enter equal error even evening event ever every exact
+example except exit expert eye face fact fail faint fair faith fall false fame family fancy farm fast fat father
+fault fear feast feather feel fence fever few field fifth fight figure fill film final find fine finger fire firm
+first fish fist five flag flame flash flat flesh flight float flock floor flour flower fluid fly fold folk food
+foot force forest fork form fort forty fox frame free fresh friend front frost fruit fuel full fun funny fur future
+game garden gate gather gift girl give glad glass glove glue goat gold good grain grand grape grass great green grey
+grip ground group grow guard guess guest guide gun habit hair half hall hammer hand happy harbor hard harm hat hate
+have head health heap heart heat heavy hedge height hello help herb high hill hint hire history hit hobby hold hole
+holiday home honest hook hope horn horse host hot hotel hour house human humor hunt hurry husband idea inch ink inner
+iron island item jacket jelly jewel job join joke judge juice jump just keep kettle key kick kid kind king kiss
+kitchen knee knife knock know label lace lady lake lamp land large last late laugh lawn lead leaf learn least leather
+leave left leg lemon length less lesson letter level lid life lift light limit line lion lip list listen little live
+load loan local lock long look loose lord lose loss loud love low luck lunch machine mad mail main make male man map
+mark market mass master match matter meal meat medal meet melt member memory men menu metal middle milk mill mind
+mine minute mirror miss mist mix model money month moon morning mother motor mountain mouse mouth move much mud music
+nail name narrow nation nature near neck need needle nerve nest net never new news night nine noble noise north nose
+note notice novel number nurse nut oak ocean offer office often oil old olive once onion only open orange order other
+oven over owner pace pack page pain paint pair palace pan panel paper parcel parent park part party pass past paste
+path patch pause peace pearl pen pencil people pepper person pet phone piano pick picture piece pig pile pilot pin
+pink pipe pitch place plain plan plane plant plate play plot pocket poem point pole police pond pool poor pork port
+post pot potato pound powder power price pride print prize profit proof proud pull pump punch pupil purple push
+queen quick quiet rabbit race radio rail rain range rank rate raw reach read ready real reason record red relief rent
+rest rice rich ride right ring rise river road rock roll roof room root rope rose rough round route row royal rule
+run sack safe sail salad salt sample sand sauce save saw say scale scarf school score screen sea seat second secret
+seed sell send sense serve seven shade shadow shake shape share sharp sheep sheet shelf shell shift shin shine ship
+shirt shock shoe shop shore short shot should shout show shut sick side sight sign silk silver simple sing sink
+sister sit six size skill skin skirt sky sleep slice slide slip slow small smart smell smile smoke snack snake snow
+soap sock soft soil soldier solid son song soon sort sound soup south space spare speak speed spell spend spice spin
+spirit spoon sport spot spring square stage stair stamp stand star start state station stay steam steel step stick
+still stitch stock stone stop store storm story stove straw street strike string strong student such sugar suit
+summer sun supper sure swamp sweet swim switch table tail take talk tall tank tape taste tax tea teach team tear
+teeth tell ten tent test thank that thick thin thing think third thumb ticket tide tiger time tin tired title toast
+today toe tongue tool tooth top torch total touch tour towel tower town toy track trade train trap tray tree trick
+trip truck true trust truth try tube tune turn twin type uncle under unit upper use valley value van vase very
+village visit voice vote wage wagon waist wait walk wall want war warm wash waste watch water wave wax way wealth
+wear weather week weight well west wet wheat wheel where while whip white whole wide wife wild will win wind window
+wine wing winter wire wise wish witch woman wood wool word work world worm worry wrap write yard year yellow young
+aamu aika ajatus auto bussi elokuva ensi haluta hattu heinä helppo hetki hiekka huone hyvä ihminen ikkuna ilma
+isä joki juhla juna kahvi kakku kala kaupunki kassa katu kauppa kaveri kenkä kesä kieli kirja kissa koira koti
+kukka kuppi kurssi kuusi kynä käsi lapsi lasi laulu leipä liha lintu lumi luokka maa maito matto meri metsä mies
+muna naapuri nainen nimi opettaja paikka paita pallo panna pankki peli perhe pilvi pitkä posti puhelin puu päivä
+rahat ranta ravintola ruoka sana sauna seinä sisko suola talo tavara tie tietty tuoli tyttö vaate vesi viikko
+viini yksi ystävä
+""".split()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--distances", help="FUZZY_DISTANCES to test (default: configured value)")
+    parser.add_argument("--words", help="Extra word file, one word per line")
+    args = parser.parse_args()
+
+    if args.distances:
+        settings.FUZZY_DISTANCES = args.distances
+    wordlist_loader.load_wordlists()
+    matcher = build_matcher(wordlist_loader.badwords)
+
+    words = list(COMMON_WORDS)
+    if args.words:
+        with open(args.words, encoding="utf-8") as f:
+            words.extend(line.strip().lower() for line in f if line.strip())
+
+    # Exact badwords are the exact checks' business; only near-misses are tested here
+    hits = [(word, matcher.match(word)) for word in words if word not in wordlist_loader.badwords]
+    hits = [(word, badword) for word, badword in hits if badword]
+
+    print(f"{len(words)} common words, FUZZY_DISTANCES={settings.FUZZY_DISTANCES}")
+    for word, badword in hits:
+        print(f"FAIL: {word!r} matches {badword!r}")
+    print("PASS" if not hits else f"FAILED ({len(hits)} hits; extend the allowlist or raise FUZZY_DISTANCES)")
+    return 1 if hits else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
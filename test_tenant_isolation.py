@@ -0,0 +1,99 @@
+"""
+Checks that tenants and the global namespace cannot see or overwrite each
+other's results.
+
+Runs the app in-process (FastAPI TestClient, dummy model) with two tenants,
+acme and beta, plus the global API_TOKEN, all using the same message id:
+
+- each caller reads back only its own verdict and text
+- nobody reads another namespace's id, including ids that embed a NUL
+  or other control characters (rejected with 422)
+- previous_id references stay within the tenant
+
+    python test_tenant_isolation.py
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+TENANT_DIR = tempfile.mkdtemp(prefix="tenants-")
+os.environ["MODEL_BACKEND"] = "dummy"
+os.environ["TENANT_POLICY_DIR"] = TENANT_DIR
+os.environ["API_TOKEN"] = "global-token"
+os.environ["INCREMENTAL_ENABLED"] = "true"
+os.environ["INCREMENTAL_MIN_LENGTH"] = "10"
+
+
+def write_tenants():
+    tokens = {hashlib.sha256(token.encode()).hexdigest(): name for token, name in
+              (("acme-token", "acme"), ("beta-token", "beta"))}
+    for name, profile in (("tokens", tokens), ("acme", {}), ("beta", {})):
+        with open(os.path.join(TENANT_DIR, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(profile, f)
+
+
+write_tenants()
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.engine import engine  # noqa: E402
+from app.segments import segment_key  # noqa: E402
+
+CALLERS = {
+    "acme": {"Authorization": "Bearer acme-token"},
+    "beta": {"Authorization": "Bearer beta-token"},
+    "global": {"Authorization": "Bearer global-token"},
+}
+
+failures = []
+
+
+def check(condition: bool, message: str):
+    print(("ok    " if condition else "FAIL  ") + message)
+    if not condition:
+        failures.append(message)
+
+
+def main() -> int:
+    with TestClient(app) as client:
+        # Same id in every namespace, different text
+        for name, headers in CALLERS.items():
+            response = client.post("/moderate", json={"id": "t1", "text": f"Message from {name}."}, headers=headers)
+            check(response.status_code == 200, f"{name} submits t1")
+
+        for name, headers in CALLERS.items():
+            result = client.get("/results/t1?wait=5", headers=headers).json()
+            check(result.get("text") == f"Message from {name}.", f"{name} reads back its own t1")
+
+        # Ids that spell out another namespace must neither read nor overwrite it
+        for name, headers in CALLERS.items():
+            for other in ("acme", "beta"):
+                if other == name:
+                    continue
+                for separator in ("%00", "%01", "%1f"):
+                    response = client.get(f"/results/{other}{separator}t1", headers=headers)
+                    check(response.status_code == 404, f"{name} cannot read {other}{separator}t1")
+                response = client.post(
+                    "/moderate", json={"id": f"{other}\u0000t1", "text": "overwrite"}, headers=headers
+                )
+                check(response.status_code == 422, f"{name} cannot submit id {other}\\0t1")
+        for name, headers in CALLERS.items():
+            result = client.get("/results/t1", headers=headers).json()
+            check(result.get("text") == f"Message from {name}.", f"{name}'s t1 is unchanged")
+
+        # previous_id only reuses the same tenant's sentence scores
+        for name in CALLERS:
+            tenant = None if name == "global" else name
+            stored = engine.segment_store.get("t1", tenant)
+            check(set(stored) == {segment_key(f"Message from {name}.")}, f"{name}'s t1 segments are its own")
+        check(not engine.segment_store.get("acme\u0000t1", None), "global lookup cannot reach acme's segments")
+
+    print("PASS" if not failures else f"FAILED ({len(failures)})")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())